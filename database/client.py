@@ -0,0 +1,100 @@
+"""
+Process-wide MongoDB client.
+
+Every repository (Database, UserDB, VerifyDB, the auto-saver) shares one
+AsyncIOMotorClient and therefore one connection pool, sized by the MONGO_*
+settings. Pool events are counted for /stats.
+"""
+
+import logging
+from collections import Counter
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from info import (
+    DATABASE_URI, DATABASE_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_MS, MONGO_COMPRESSORS
+)
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connection pool events of the shared client"""
+
+    def __init__(self):
+        self.events = Counter()
+        self.open = 0
+        self.checked_out = 0
+
+    def pool_created(self, event):
+        self.events['pools_created'] += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.events['pools_cleared'] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.events['created'] += 1
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.events['closed'] += 1
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.events['checkout_failed'] += 1
+
+    def connection_checked_out(self, event):
+        self.events['checkouts'] += 1
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+
+pool_stats = PoolStats()
+
+
+def get_client():
+    """The shared client, created on first use"""
+    global _client
+    if _client is None:
+        options = {
+            'maxPoolSize': MONGO_MAX_POOL_SIZE,
+            'minPoolSize': MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': MONGO_MAX_IDLE_MS,
+            'event_listeners': [pool_stats]
+        }
+        if MONGO_COMPRESSORS:
+            options['compressors'] = MONGO_COMPRESSORS
+        _client = AsyncIOMotorClient(DATABASE_URI, **options)
+        logger.info(f"🔌 MongoDB client created (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+    return _client
+
+
+def get_database():
+    """The bot's database on the shared client"""
+    return get_client()[DATABASE_NAME]
+
+
+def client_stats():
+    """Connection pool counters for /stats"""
+    return {
+        'open': pool_stats.open,
+        'in_use': pool_stats.checked_out,
+        'max_pool_size': MONGO_MAX_POOL_SIZE,
+        **pool_stats.events
+    }
@@ -1,25 +1,110 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from info import DATABASE_URI, DATABASE_NAME
+from info import (
+    SEARCH_INDEX, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL,
+    SEARCH_COUNT_MODE, SEARCH_COUNT_CAP, SPELL_CHECK
+)
+from database.client import get_database
+from database.group_registry import group_registry
+from database.migrations import run_migrations
+from database.entitlements import entitlements, ENTITLEMENT_FIELDS
+from database.search_index import (
+    search_index, normalize_query, QUALITY_RANK,
+    YEAR_MATCH_WEIGHT, QUALITY_WEIGHT, POPULARITY_WEIGHT
+)
+from utils.cache import TTLCache
+from utils.single_flight import SingleFlight
+from utils.file_detector import extract_media_metadata_many, metadata_filter
+from utils.caption_cleaner import make_display_name
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+# Shared by every Database() instance - cleared whenever the files collection changes
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+# Identical searches running at the same time share one backend call
+search_flight = SingleFlight()
+
+EMPTY_FACETS = {'languages': {}, 'quality': {}, 'season': {}, 'episode': {}}
+
+# Read models - every read names the fields it uses. Listings never fetch the caption:
+# it is only read for the few files saved before display_name existed (see _with_display_names).
+FILE_LIST_PROJECTION = {'display_name': 1, 'file_name': 1, 'file_size': 1}
+FILE_SEND_PROJECTION = {**FILE_LIST_PROJECTION, 'caption': 1, 'file_id': 1, 'file_type': 1}
+USER_PROJECTION = {
+    '_id': 0, 'user_id': 1, 'points': 1, 'premium_expire': 1,
+    'referred_by': 1, 'referral_count': 1, 'total_referrals': 1
+}
+GROUP_PROJECTION = {'_id': 0, 'group_id': 1, 'group_name': 1, 'settings': 1}
+
+
+# Bumped on every write to the files collection - memoized result pages are keyed by it.
+# Starts from the clock so sessions restored from Mongo never share keys with this process.
+results_version = time.time_ns()
+
+
+def invalidate_search_cache():
+    """Drop cached search results after a write to the files collection"""
+    global results_version
+    results_version += 1
+    search_cache.clear()
+
+
+def current_results_version():
+    return results_version
+
+
+def cache_result(key, value, version):
+    """Cache a search result unless a write landed while it was computed (it may predate the write)"""
+    if version == results_version:
+        search_cache.set(key, value)
+
+
+def rank_stages(query):
+    """
+    Aggregation stages ordering $text matches like the in-memory index does:
+    text score, year match, preferred quality and popularity
+    """
+    years = [int(t) for t in query.split() if len(t) == 4 and t.isdigit()]
+    score = {'$add': [
+        {'$meta': 'textScore'},
+        {'$cond': [{'$in': ['$year', years]}, YEAR_MATCH_WEIGHT, 0]},
+        {'$multiply': [QUALITY_WEIGHT, {'$switch': {
+            'branches': [
+                {'case': {'$eq': ['$quality', quality]}, 'then': rank}
+                for quality, rank in QUALITY_RANK.items()
+            ],
+            'default': 0
+        }}]},
+        {'$multiply': [POPULARITY_WEIGHT, {'$ln': {'$add': [{'$ifNull': ['$downloads', 0]}, 1]}}]}
+    ]}
+    return [
+        {'$addFields': {'_score': score}},
+        {'$sort': {'_score': -1, '_id': -1}}
+    ]
+
+
+def format_total(total):
+    """Render a search total, showing capped counts as '1000+'"""
+    if SEARCH_COUNT_MODE == 'capped' and total > SEARCH_COUNT_CAP:
+        return f"{SEARCH_COUNT_CAP}+"
+    return str(total)
+
 class Database:
-    def __init__(self):
-        self.client = AsyncIOMotorClient(DATABASE_URI)
-        self.db = self.client[DATABASE_NAME]
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_database()
         self.col = self.db['files']
         self.grp = self.db['groups']
         self.usr = self.db['users']
+        self.sessions = self.db['search_sessions']
 
     async def create_index(self):
-        """Create database indexes"""
+        """Create database indexes (every index is declared in database/migrations.py)"""
         try:
-            await self.col.create_index([('file_name', 'text')])
-            await self.usr.create_index([('user_id', 1)])
-            await self.grp.create_index([('group_id', 1)])
-            logger.info("Database indexes created successfully")
+            await run_migrations(self.db)
         except Exception as e:
             logger.error(f"Error creating indexes: {e}")
 
@@ -28,51 +113,261 @@ class Database:
     async def add_file(self, file_data):
         """Add file to database"""
         try:
-            await self.col.insert_one(file_data)
+            result = await self.col.insert_one(file_data)
+            search_index.add({**file_data, '_id': result.inserted_id})
+            invalidate_search_cache()
             return True
+        except DuplicateKeyError:
+            logger.info(f"⚠️ File already in database: {file_data.get('file_name', '')[:30]}...")
+            return False
         except Exception as e:
             logger.error(f"Error adding file: {e}")
             return False
 
-    async def get_file(self, file_id):
-        """Get file by ID"""
-        return await self.col.find_one({'_id': file_id})
+    async def get_file(self, file_id, projection=FILE_SEND_PROJECTION):
+        """Get file by ID - the fields needed to deliver it unless the caller names others"""
+        return await self.col.find_one({'_id': file_id}, projection)
 
     async def search_files(self, query, offset=0, limit=10):
-        """Search files by query"""
+        """Search files by query - cached, and served from the in-memory index once it is loaded"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return [], 0
+        
+        key = (normalized, offset, limit)
+        cached = search_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Callers arriving after a write never join a search that started before it
+        version = results_version
         try:
-            cursor = self.col.find(
-                {'$text': {'$search': query}}
-            ).skip(offset).limit(limit)
-            files = await cursor.to_list(length=limit)
-            total = await self.col.count_documents({'$text': {'$search': query}})
-            return files, total
+            result = await search_flight.do(
+                (version,) + key, lambda: self._run_search(normalized, offset, limit)
+            )
         except Exception as e:
             logger.error(f"Search error: {e}")
             return [], 0
+        
+        cache_result(key, result, version)
+        return result
+
+    def _ensure_index(self):
+        if SEARCH_INDEX or SPELL_CHECK:
+            # The loader also feeds the spell-check vocabulary
+            search_index.ensure_loading(self.col)
+
+    async def _run_search(self, query, offset, limit):
+        """One backend search - the index once loaded, Mongo $text until then"""
+        self._ensure_index()
+        if SEARCH_INDEX and search_index.ready:
+            return await self._search_indexed(query, offset, limit)
+        return await self._search_text(query, offset, limit)
+
+    async def _search_indexed(self, query, offset, limit):
+        """Resolve the page from the index, then read only those documents"""
+        ids, total = search_index.search_ids(query, offset, limit)
+        return await self.get_files_by_ids(ids), total
+
+    async def _search_text(self, query, offset, limit, mode=None):
+        """
+        Fallback search through the Mongo text index.
+        mode (default SEARCH_COUNT_MODE):
+          facet  - one aggregation returning the page and the exact count
+          capped - one aggregation, counting stops at SEARCH_COUNT_CAP + 1
+          exact  - find + count_documents (two round trips)
+        """
+        mode = mode or SEARCH_COUNT_MODE
+        match = {'$text': {'$search': query}}
+        
+        if mode == 'exact':
+            cursor = self.col.find(
+                match, {**FILE_LIST_PROJECTION, 'score': {'$meta': 'textScore'}}
+            ).sort([('score', {'$meta': 'textScore'})]).skip(offset).limit(limit)
+            files = await cursor.to_list(length=limit)
+            total = await self.col.count_documents(match)
+            return await self._with_display_names(files), total
+        
+        count_stages = [{'$count': 'n'}]
+        if mode == 'capped':
+            count_stages.insert(0, {'$limit': SEARCH_COUNT_CAP + 1})
+        
+        pipeline = [
+            {'$match': match},
+            {'$facet': {
+                'files': rank_stages(query) + [
+                    {'$skip': offset}, {'$limit': limit}, {'$project': FILE_LIST_PROJECTION}
+                ],
+                'total': count_stages
+            }}
+        ]
+        result = await self.col.aggregate(pipeline).to_list(length=1)
+        if not result:
+            return [], 0
+        files = result[0]['files']
+        total = result[0]['total'][0]['n'] if result[0]['total'] else 0
+        return await self._with_display_names(files), total
+
+    async def search_file_ids(self, query):
+        """Return the ordered _ids of the files matching query (a search session's candidates, capped in capped count mode) - cached"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return []
+        key = ('ids', normalized)
+        cached = search_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        version = results_version
+        try:
+            ids = await search_flight.do((version,) + key, lambda: self._run_search_ids(normalized))
+        except Exception as e:
+            logger.error(f"Error getting search ids: {e}")
+            return []
+        
+        cache_result(key, ids, version)
+        return ids
+
+    async def _run_search_ids(self, query):
+        # Capped mode keeps the best SEARCH_COUNT_CAP + 1 candidates, shown as "1000+"
+        limit = SEARCH_COUNT_CAP + 1 if SEARCH_COUNT_MODE == 'capped' else None
+        self._ensure_index()
+        if SEARCH_INDEX and search_index.ready:
+            return search_index.search_all_ids(query, limit)
+        
+        pipeline = [{'$match': {'$text': {'$search': query}}}] + rank_stages(query)
+        if limit:
+            pipeline.append({'$limit': limit})  # Coalesces with the $sort into a top-k sort
+        pipeline.append({'$project': {'_id': 1}})
+        return [doc['_id'] async for doc in self.col.aggregate(pipeline)]
+
+    async def filter_file_ids(self, ids, filters):
+        """
+        Keep the ids whose file matches filters ({'language', 'quality', 'season',
+        'episode'}), in their original order - a bitmap AND once the index is
+        loaded, a Mongo predicate on the stored metadata fields until then.
+        """
+        predicate = metadata_filter(filters)
+        if not predicate or not ids:
+            return list(ids)
+        if SEARCH_INDEX and search_index.ready:
+            return search_index.filter_ids(ids, predicate)
+        try:
+            cursor = self.col.find({'_id': {'$in': list(ids)}, **predicate}, {'_id': 1})
+            matched = {doc['_id'] async for doc in cursor}
+        except Exception as e:
+            logger.error(f"Error filtering ids: {e}")
+            return []
+        return [i for i in ids if i in matched]
+
+    async def get_facet_counts(self, ids, key):
+        """
+        Count every language/quality/season/episode value across ids (a search
+        session's results, narrowed by its filters) - bitmaps once the index is
+        loaded, one aggregation until then. Cached under key next to the search
+        results, so each filter menu queries Mongo at most once per result set.
+        """
+        if not ids:
+            return EMPTY_FACETS
+        
+        key = ('facets',) + key
+        cached = search_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        version = results_version
+        try:
+            facets = await search_flight.do((version,) + key, lambda: self._count_facets(ids))
+        except Exception as e:
+            logger.error(f"Error counting facets: {e}")
+            return EMPTY_FACETS
+        
+        cache_result(key, facets, version)
+        return facets
+
+    async def _count_facets(self, ids):
+        if SEARCH_INDEX and search_index.ready:
+            # Attribute bitmaps ANDed with the results - no Mongo round trip
+            return search_index.facet_counts(ids)
+        
+        match = {'_id': {'$in': list(ids)}}
+        
+        def count_by(field):
+            return [
+                {'$match': {field: {'$ne': None}}},
+                {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}
+            ]
+        
+        pipeline = [
+            {'$match': match},
+            {'$facet': {
+                'languages': [{'$unwind': '$languages'}] + count_by('languages'),
+                'quality': count_by('quality'),
+                'season': count_by('season'),
+                'episode': count_by('episode')
+            }}
+        ]
+        result = await self.col.aggregate(pipeline).to_list(length=1)
+        return {
+            name: {item['_id']: item['count'] for item in buckets}
+            for name, buckets in (result[0] if result else EMPTY_FACETS).items()
+        }
+
+    async def get_files_by_ids(self, ids, projection=FILE_LIST_PROJECTION):
+        """Fetch files by _id in one read, keeping the order of ids"""
+        if not ids:
+            return []
+        docs = await self.col.find({'_id': {'$in': list(ids)}}, projection).to_list(length=len(ids))
+        if projection is FILE_LIST_PROJECTION:
+            docs = await self._with_display_names(docs)
+        by_id = {doc['_id']: doc for doc in docs}
+        return [by_id[i] for i in ids if i in by_id]
+
+    async def _with_display_names(self, docs):
+        """Read the caption (the display-name fallback) only for listed files saved before display_name"""
+        missing = [doc['_id'] for doc in docs if not doc.get('display_name')]
+        if missing:
+            cursor = self.col.find({'_id': {'$in': missing}}, {'caption': 1})
+            captions = {doc['_id']: doc.get('caption', '') async for doc in cursor}
+            for doc in docs:
+                if doc['_id'] in captions:
+                    doc['caption'] = captions[doc['_id']]
+        return docs
+
+    async def record_download(self, file_id):
+        """Count a delivery of a file - the popularity signal used for ranking"""
+        try:
+            await self.col.update_one({'_id': file_id}, {'$inc': {'downloads': 1}})
+            search_index.record_download(file_id)
+        except Exception as e:
+            logger.error(f"Error recording download: {e}")
 
     async def delete_file(self, file_id):
         """Delete file from database"""
         await self.col.delete_one({'_id': file_id})
+        search_index.remove(file_id)
+        invalidate_search_cache()
 
-    async def get_all_files(self):
+    async def get_all_files(self, projection=FILE_LIST_PROJECTION):
         """Get all files"""
-        cursor = self.col.find({})
+        cursor = self.col.find({}, projection)
         return await cursor.to_list(length=None)
 
     async def delete_all_files(self):
         """Delete all files"""
         result = await self.col.delete_many({})
+        search_index.clear()
+        invalidate_search_cache()
         return result
 
     async def total_files_count(self):
         """Count total files"""
         return await self.col.count_documents({})
 
-    async def get_file_by_file_id(self, file_id):
+    async def get_file_by_file_id(self, file_id, projection=FILE_SEND_PROJECTION):
         """Get file data by Telegram file_id"""
         try:
-            file_data = await self.col.find_one({'file_id': file_id})
+            file_data = await self.col.find_one({'file_id': file_id}, projection)
             return file_data
         except Exception as e:
             logger.error(f"Error getting file by file_id: {e}")
@@ -81,7 +376,11 @@ class Database:
     async def delete_file_by_file_id(self, file_id):
         """Delete file from database by Telegram file_id"""
         try:
+            doc = await self.col.find_one({'file_id': file_id}, {'_id': 1})
             result = await self.col.delete_one({'file_id': file_id})
+            if doc:
+                search_index.remove(doc['_id'])
+            invalidate_search_cache()
             logger.info(f"Deleted file by file_id: {file_id}, count: {result.deleted_count}")
             return result
         except Exception as e:
@@ -92,12 +391,50 @@ class Database:
         """Delete file from database by MongoDB _id"""
         try:
             result = await self.col.delete_one({'_id': mongo_id})
+            search_index.remove(mongo_id)
+            invalidate_search_cache()
             logger.info(f"Deleted file by ID: {mongo_id}, count: {result.deleted_count}")
             return result
         except Exception as e:
             logger.error(f"Error deleting file by ID: {e}")
             return None
 
+    async def backfill_media_metadata(self, batch_size=500):
+        """Store extracted metadata and display names on files saved before they were computed at ingest"""
+        updated = 0
+        try:
+            cursor = self.col.find(
+                {'$or': [{'languages': {'$exists': False}}, {'display_name': {'$exists': False}}]},
+                {'file_name': 1, 'caption': 1}
+            )
+            docs = []
+            async for doc in cursor:
+                docs.append(doc)
+                if len(docs) >= batch_size:
+                    updated += await self._backfill_batch(docs)
+                    docs = []
+            if docs:
+                updated += await self._backfill_batch(docs)
+            
+            if updated:
+                invalidate_search_cache()
+            logger.info(f"✅ Backfilled metadata for {updated} files")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling metadata: {e}")
+            return updated
+
+    async def _backfill_batch(self, docs):
+        """Classify a batch of files with the keyword matcher and write them back in one bulk_write"""
+        items = [(doc.get('file_name', ''), doc.get('caption', '')) for doc in docs]
+        requests = []
+        for doc, (file_name, caption), metadata in zip(docs, items, extract_media_metadata_many(items)):
+            fields = {**metadata, 'display_name': make_display_name(file_name, caption)}
+            requests.append(UpdateOne({'_id': doc['_id']}, {'$set': fields}))
+            search_index.set_attributes(doc['_id'], metadata)
+        await self.col.bulk_write(requests, ordered=False)
+        return len(requests)
+
     # ============ 🆕 DUPLICATE DETECTION METHODS ============
     
     async def find_duplicate_files(self, file_name, file_size):
@@ -109,7 +446,7 @@ class Database:
             duplicates = self.col.find({
                 'file_name': file_name,
                 'file_size': file_size
-            })
+            }, {'file_unique_id': 1})
             
             result = await duplicates.to_list(length=None)
             return result
@@ -188,8 +525,11 @@ class Database:
                 
                 for file in to_delete:
                     await self.col.delete_one({'_id': file['id']})
+                    search_index.remove(file['id'])
                     deleted_count += 1
             
+            if deleted_count:
+                invalidate_search_cache()
             logger.info(f"✅ Deleted {deleted_count} duplicate files")
             return deleted_count
             
@@ -206,24 +546,55 @@ class Database:
             {'$set': {'group_name': group_name}},
             upsert=True
         )
+        group = await self.grp.find_one({'group_id': group_id}, {'settings': 1})
+        group_registry.add(group_id, group.get('settings') if group else None)
 
-    async def get_group(self, group_id):
+    async def update_group_settings(self, group_id, settings):
+        """Update per-group settings (page_size, auto_delete, auto_delete_time)"""
+        await self.grp.update_one(
+            {'group_id': group_id},
+            {'$set': {f'settings.{key}': value for key, value in settings.items()}}
+        )
+        group_registry.update(group_id, settings)
+
+    async def get_group(self, group_id, projection=GROUP_PROJECTION):
         """Get group by ID"""
-        return await self.grp.find_one({'group_id': group_id})
+        return await self.grp.find_one({'group_id': group_id}, projection)
 
-    async def get_all_groups(self):
+    async def get_all_groups(self, projection=GROUP_PROJECTION):
         """Get all groups"""
-        cursor = self.grp.find({})
+        cursor = self.grp.find({}, projection)
         return await cursor.to_list(length=None)
 
     async def delete_group(self, group_id):
         """Delete group"""
         await self.grp.delete_one({'group_id': group_id})
+        group_registry.remove(group_id)
 
     async def total_groups_count(self):
         """Count total groups"""
         return await self.grp.count_documents({})
 
+    # ============ SEARCH SESSION METHODS ============
+
+    async def save_search_session(self, token, fields):
+        """Upsert (part of) a search session; Mongo drops it SEARCH_SESSION_TTL after the last write"""
+        try:
+            await self.sessions.update_one(
+                {'_id': token},
+                {'$set': {**fields, 'updated_at': datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error saving search session: {e}")
+
+    async def get_search_session(self, token):
+        try:
+            return await self.sessions.find_one({'_id': token}, {'updated_at': 0})
+        except Exception as e:
+            logger.error(f"Error getting search session: {e}")
+            return None
+
     # ============ USER METHODS ============
     
     async def add_user(self, user_id):
@@ -248,9 +619,9 @@ class Database:
             logger.error(f"Error adding user: {e}")
             return False
 
-    async def get_user(self, user_id):
+    async def get_user(self, user_id, projection=USER_PROJECTION):
         """Get user data"""
-        return await self.usr.find_one({'user_id': user_id})
+        return await self.usr.find_one({'user_id': user_id}, projection)
     
     async def update_user(self, user_id, update_data):
         """🆕 Update user data with custom fields"""
@@ -260,6 +631,8 @@ class Database:
                 {'$set': update_data},
                 upsert=True
             )
+            if set(update_data).intersection(ENTITLEMENT_FIELDS):
+                entitlements.invalidate(user_id)
             return True
         except Exception as e:
             logger.error(f"Error updating user: {e}")
@@ -272,12 +645,9 @@ class Database:
     # ============ PREMIUM METHODS ============
     
     async def is_premium_user(self, user_id):
-        """Check if user is premium"""
+        """Check if user is premium - answered from the entitlement cache when possible"""
         try:
-            user = await self.usr.find_one({'user_id': user_id})
-            if user and user.get('premium_expire', 0) > int(time.time()):
-                return True
-            return False
+            return (await self._entitlement(user_id)).is_premium()
         except Exception as e:
             logger.error(f"Error checking premium: {e}")
             return False
@@ -285,12 +655,21 @@ class Database:
     async def get_premium_expire(self, user_id):
         """Get premium expiry time"""
         try:
-            user = await self.usr.find_one({'user_id': user_id})
-            return user.get('premium_expire', 0) if user else 0
+            return (await self._entitlement(user_id)).premium_until
         except Exception as e:
             logger.error(f"Error getting premium expire: {e}")
             return 0
 
+    async def _entitlement(self, user_id):
+        """Cached entitlement, read (premium and verification fields only) on a miss"""
+        cached = entitlements.get(user_id)
+        if cached is not None:
+            return cached
+        user = await self.usr.find_one(
+            {'user_id': user_id}, {'_id': 0, **{field: 1 for field in ENTITLEMENT_FIELDS}}
+        )
+        return entitlements.remember(user_id, user)
+
     async def make_premium(self, user_id, expire_time):
         """Make user premium"""
         try:
@@ -299,6 +678,7 @@ class Database:
                 {'$set': {'premium_expire': expire_time}},
                 upsert=True
             )
+            entitlements.invalidate(user_id)
             
             return True
         except Exception as e:
@@ -310,7 +690,7 @@ class Database:
     async def get_points(self, user_id):
         """Get user points"""
         try:
-            user = await self.usr.find_one({'user_id': user_id})
+            user = await self.usr.find_one({'user_id': user_id}, {'_id': 0, 'points': 1})
             return user.get('points', 0) if user else 0
         except Exception as e:
             logger.error(f"Error getting points: {e}")
@@ -330,6 +710,21 @@ class Database:
             logger.error(f"Error adding points: {e}")
             return False
 
+    async def credit_referral(self, referrer_id, points):
+        """Add referral points and count the referral in one write; returns the new point total"""
+        try:
+            user = await self.usr.find_one_and_update(
+                {'user_id': referrer_id},
+                {'$inc': {'points': points, 'total_referrals': 1}},
+                projection={'_id': 0, 'points': 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return user.get('points', 0) if user else 0
+        except Exception as e:
+            logger.error(f"Error crediting referral: {e}")
+            return None
+
     async def deduct_points(self, user_id, points):
         """Deduct points from user"""
         try:
@@ -346,7 +741,7 @@ class Database:
     async def get_referral_count(self, user_id):
         """Get user referral count"""
         try:
-            user = await self.usr.find_one({'user_id': user_id})
+            user = await self.usr.find_one({'user_id': user_id}, {'_id': 0, 'referral_count': 1})
             return user.get('referral_count', 0) if user else 0
         except Exception as e:
             logger.error(f"Error getting referral count: {e}")
@@ -0,0 +1,74 @@
+"""
+In-process cache of who is premium or verified.
+
+Entitlements change rarely (verification, premium grants, redemption, expiry)
+but were read from Mongo on every file request. Each entry stores the exact
+timestamps the user's premium and verification end, so expiry needs no
+invalidation; every write that grants or revokes one drops the entry.
+"""
+
+import logging
+import time
+from collections import namedtuple
+from info import VERIFY_EXPIRE, ENTITLEMENT_CACHE_SIZE, ENTITLEMENT_CACHE_TTL
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Fields an entitlement is computed from - writes touching them must invalidate
+ENTITLEMENT_FIELDS = ('premium_expire', 'is_premium', 'is_verified', 'verify_time')
+
+
+class Entitlement(namedtuple('Entitlement', 'premium_until verified_until')):
+    """
+    premium_until: when premium ends (Database.is_premium_user rules);
+    verified_until: when file access without a token ends (VerifyDB.is_verified rules).
+    """
+
+    def is_premium(self, now=None):
+        return self.premium_until > (now or int(time.time()))
+
+    def is_verified(self, now=None):
+        return self.verified_until > (now or int(time.time()))
+
+
+def entitlement_from_doc(doc):
+    """Entitlement of a user document (None or missing fields mean none)"""
+    doc = doc or {}
+    premium_expire = doc.get('premium_expire') or 0
+    verified_until = premium_expire if doc.get('is_premium') else 0
+    if doc.get('is_verified'):
+        verified_until = max(verified_until, (doc.get('verify_time') or 0) + VERIFY_EXPIRE)
+    return Entitlement(premium_expire, verified_until)
+
+
+class EntitlementCache:
+    """user_id -> Entitlement, LRU-bounded; the TTL only limits staleness from other processes"""
+
+    def __init__(self, maxsize=ENTITLEMENT_CACHE_SIZE, ttl=ENTITLEMENT_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.invalidations = 0
+
+    def __contains__(self, user_id):
+        return user_id in self._cache
+
+    def get(self, user_id):
+        """Cached Entitlement or None"""
+        return self._cache.get(user_id)
+
+    def remember(self, user_id, doc):
+        """Cache the entitlement of a freshly read user document and return it"""
+        entitlement = entitlement_from_doc(doc)
+        self._cache.set(user_id, entitlement)
+        return entitlement
+
+    def invalidate(self, user_id):
+        """Drop a user's entry after a write that changes their entitlement"""
+        if self._cache.pop(user_id) is not None:
+            self.invalidations += 1
+
+    def stats(self):
+        return {**self._cache.stats(), 'invalidations': self.invalidations}
+
+
+entitlements = EntitlementCache()
@@ -0,0 +1,86 @@
+"""
+In-memory copy of the `groups` collection.
+
+Group search checks membership and reads per-group settings on every message,
+so both are answered from here in O(1). The registry is loaded once and kept
+current by Database.add_group / delete_group / update_group_settings.
+"""
+
+import asyncio
+import logging
+from info import MAX_LIST_ELM
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP_SETTINGS = {
+    'page_size': MAX_LIST_ELM,
+    'auto_delete': False,
+    'auto_delete_time': 600
+}
+
+
+class GroupRegistry:
+    """group_id -> settings for every connected group"""
+
+    def __init__(self):
+        self._groups = {}
+        self._removed_while_loading = set()
+        self._load_task = None
+        self.ready = False
+
+    def __contains__(self, group_id):
+        return group_id in self._groups
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add(self, group_id, settings=None):
+        self._removed_while_loading.discard(group_id)
+        self._groups[group_id] = {**DEFAULT_GROUP_SETTINGS, **(settings or {})}
+
+    def remove(self, group_id):
+        if not self.ready:
+            self._removed_while_loading.add(group_id)
+        self._groups.pop(group_id, None)
+
+    def update(self, group_id, settings):
+        if group_id in self._groups:
+            self._groups[group_id].update(settings)
+
+    def settings(self, chat_id):
+        """Settings of a connected group, defaults for anything else (e.g. private chats)"""
+        return self._groups.get(chat_id, DEFAULT_GROUP_SETTINGS)
+
+    def page_size(self, chat_id):
+        return self.settings(chat_id)['page_size']
+
+    async def load(self, collection):
+        try:
+            groups = {}
+            async for group in collection.find({}, {'group_id': 1, 'settings': 1}):
+                groups[group['group_id']] = {**DEFAULT_GROUP_SETTINGS, **group.get('settings', {})}
+            # Keep groups connected/disconnected while loading
+            groups.update(self._groups)
+            for group_id in self._removed_while_loading:
+                groups.pop(group_id, None)
+            self._groups = groups
+            self._removed_while_loading.clear()
+            self.ready = True
+            logger.info(f"👥 Group registry loaded: {len(self._groups)} connected groups")
+        except Exception as e:
+            logger.error(f"Error loading group registry: {e}")
+
+    def ensure_loading(self, collection):
+        """Start loading in the background once; until ready, callers should not gate on it"""
+        if self.ready or self._load_task is not None:
+            return
+        self._load_task = asyncio.create_task(self.load(collection))
+
+        def _reset(task):
+            if not self.ready:
+                self._load_task = None
+
+        self._load_task.add_done_callback(_reset)
+
+
+group_registry = GroupRegistry()
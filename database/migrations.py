@@ -0,0 +1,194 @@
+"""
+Versioned index and data migrations.
+
+Every index a query relies on is declared here, one numbered migration per
+change. Applied versions are recorded in the `migrations` collection, so each
+runs once per database; new migrations are only ever appended.
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import DuplicateKeyError
+from info import SEARCH_SESSION_TTL
+from database.client import get_database
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', 'version description apply')
+
+
+async def remove_duplicates(col, keys):
+    """
+    Keep the oldest document per value of keys and delete the rest. Updates
+    filtered on those keys hit the oldest copy, so it is the one holding the data.
+    """
+    pipeline = [
+        {'$match': {key: {'$exists': True} for key in keys}},
+        {'$group': {
+            '_id': {key: f'${key}' for key in keys},
+            'ids': {'$push': '$_id'},
+            'count': {'$sum': 1}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+    removed = 0
+    async for group in col.aggregate(pipeline, allowDiskUse=True):
+        extra = sorted(group['ids'])[1:]
+        result = await col.delete_many({'_id': {'$in': extra}})
+        removed += result.deleted_count
+    if removed:
+        logger.warning(f"🧱 Removed {removed} duplicate {'/'.join(keys)} documents from {col.name}")
+    return removed
+
+
+def indexes(collection, *models, replace_non_unique=False):
+    """
+    Migration step creating index models on a collection. replace_non_unique
+    swaps an older non-unique index on the same keys for the unique model:
+    duplicates are removed first, and the old index is put back if the unique
+    build still fails, so the collection is never left unindexed.
+    """
+    async def apply(db):
+        col = db[collection]
+        dropped = []
+        if replace_non_unique:
+            existing = await col.index_information()
+            for model in models:
+                spec = model.document
+                if not spec.get('unique'):
+                    continue
+                await remove_duplicates(col, list(spec['key']))
+                for name, info in existing.items():
+                    if name != '_id_' and info['key'] == list(spec['key'].items()) and not info.get('unique'):
+                        await col.drop_index(name)
+                        dropped.append(info['key'])
+        try:
+            await col.create_indexes(list(models))
+        except Exception:
+            for key in dropped:
+                await col.create_index(key)
+            raise
+    return apply
+
+
+def drop_unique(collection, model):
+    """
+    Migration step replacing a unique index on the model's keys with the
+    (non-unique) model - for keys that turned out to allow legitimate repeats.
+    """
+    async def apply(db):
+        col = db[collection]
+        keys = list(model.document['key'].items())
+        for name, info in (await col.index_information()).items():
+            if name != '_id_' and info['key'] == keys and info.get('unique'):
+                await col.drop_index(name)
+        await col.create_indexes([model])
+    return apply
+
+
+MIGRATIONS = [
+    Migration(1, "files: title text index, file_id lookups", indexes(
+        'files',
+        IndexModel([('file_name', TEXT)]),
+        IndexModel([('file_id', ASCENDING)])
+    )),
+    Migration(2, "files: name + size for duplicate detection", indexes(
+        'files',
+        IndexModel([('file_name', ASCENDING), ('file_size', ASCENDING)])
+    )),
+    # Not unique: duplicate_handler keeps copies of one file posted to several channels
+    Migration(3, "files: file_unique_id lookups", indexes(
+        'files',
+        IndexModel([('file_unique_id', ASCENDING)])
+    )),
+    Migration(4, "files: metadata filters", indexes(
+        'files',
+        IndexModel([('languages', ASCENDING), ('quality', ASCENDING)]),
+        IndexModel([('season', ASCENDING), ('episode', ASCENDING)]),
+        IndexModel([('year', ASCENDING)])
+    )),
+    Migration(5, "users: unique user_id", indexes(
+        'users',
+        IndexModel([('user_id', ASCENDING)], unique=True),
+        replace_non_unique=True
+    )),
+    Migration(6, "groups: unique group_id", indexes(
+        'groups',
+        IndexModel([('group_id', ASCENDING)], unique=True),
+        replace_non_unique=True
+    )),
+    Migration(7, "search_sessions: expire after SEARCH_SESSION_TTL", indexes(
+        'search_sessions',
+        IndexModel([('updated_at', ASCENDING)], expireAfterSeconds=SEARCH_SESSION_TTL)
+    )),
+    Migration(8, "files: file_unique_id no longer unique", drop_unique(
+        'files',
+        IndexModel([('file_unique_id', ASCENDING)])
+    )),
+]
+
+_task = None
+
+
+async def run_migrations(db=None):
+    """Apply every migration not recorded yet; a failed one is retried on the next run"""
+    db = db if db is not None else get_database()
+    applied = {doc['_id'] async for doc in db.migrations.find({}, {'_id': 1})}
+    done = failed = 0
+
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        started = time.monotonic()
+        try:
+            await migration.apply(db)
+        except Exception as e:
+            failed += 1
+            logger.error(f"❌ Migration {migration.version} ({migration.description}) failed: {e}")
+            continue
+
+        try:
+            await db.migrations.insert_one({
+                '_id': migration.version,
+                'description': migration.description,
+                'applied_at': datetime.utcnow(),
+                'seconds': round(time.monotonic() - started, 2)
+            })
+        except DuplicateKeyError:
+            pass  # Another instance applied it at the same time
+        done += 1
+        logger.info(f"🧱 Migration {migration.version} applied: {migration.description}")
+
+    if done or failed:
+        logger.info(f"🧱 Migrations: {done} applied, {failed} failed, {len(applied)} already done")
+    return done, failed
+
+
+def ensure_migrations():
+    """Run the migrations once in the background; callers never wait for index builds"""
+    global _task
+    if _task is not None:
+        return
+    _task = asyncio.create_task(run_migrations())
+
+    def _retry_later(task):
+        global _task
+        if not task.cancelled() and task.exception():
+            logger.error(f"Migration runner crashed: {task.exception()}")
+            _task = None
+
+    _task.add_done_callback(_retry_later)
+
+
+async def migration_status(db=None):
+    """[(version, description, applied_at or None)] for /migrations"""
+    db = db if db is not None else get_database()
+    applied = {doc['_id']: doc async for doc in db.migrations.find({})}
+    return [
+        (m.version, m.description, applied.get(m.version, {}).get('applied_at'))
+        for m in MIGRATIONS
+    ]
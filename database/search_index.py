@@ -0,0 +1,382 @@
+"""
+In-memory inverted index over the `files` collection.
+
+Every title term (a token stemmed and stop-word filtered like the Mongo text
+index) maps to a posting list of file ordinals. Files containing every query
+term match; only when none does, files containing any of them match, ranked by
+how many they contain. Ordinals are handed out in insertion order, so posting
+lists stay sorted without extra work and
+newer files always have larger ordinals. Search runs entirely in memory and
+only the ids of the requested page are handed back to Mongo.
+
+Each language, quality, season and episode value also has a bitmap over the
+same ordinals, so combined filters and facet counts are bitwise ANDs.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import re
+import time
+from info import SPELL_CHECK, SEARCH_QUALITY_PREFERENCE
+from utils.bitmap import Bitmap
+from utils.prefix_index import PrefixIndex
+from utils.spell_check import spell_checker
+
+logger = logging.getLogger(__name__)
+
+# Split on anything that is not a word character, but keep Indic vowel signs
+# (U+0900-U+0DFF) attached to their letters so Tamil/Hindi titles stay whole
+TOKEN_SPLIT = re.compile(r"[^\w\u0900-\u0dff]+|_+")
+
+# Fields the loader needs - never pull captions/file ids into memory here
+INDEX_PROJECTION = {
+    'file_name': 1, 'file_size': 1, 'quality': 1, 'year': 1, 'downloads': 1,
+    'languages': 1, 'season': 1, 'episode': 1
+}
+
+# Metadata fields with a bitmap per value (same names as the metadata_filter predicate)
+ATTRIBUTE_FIELDS = ('languages', 'quality', 'season', 'episode')
+
+# Mongo's English text-index stop words, as tokenize() splits them ("don't" -> "don", "t")
+STOP_WORDS = frozenset("""
+    a about above after again against all am an and any are aren as at be because been
+    before being below between both but by can cannot could couldn d did didn do does
+    doesn doing don down during each few for from further had hadn has hasn have haven
+    having he her here hers herself him himself his how i if in into is isn it its itself
+    let ll m me more most mustn my myself no nor not of off on once only or other ought
+    our ours ourselves out over own re s same shan she should shouldn so some such t than
+    that the their theirs them themselves then there these they this those through to too
+    under until up ve very was wasn we were weren what when where which while who whom why
+    with won would wouldn you your yours yourself yourselves
+""".split())
+
+# A term in more than this share of titles (mkv, 1080p) is ignored unless nothing else is left
+COMMON_TERM_SHARE = 0.5
+
+# Ranking weights
+EXACT_TITLE_WEIGHT = 10.0   # scaled by how much of the title the query covers
+YEAR_MATCH_WEIGHT = 3.0
+QUALITY_WEIGHT = 0.5        # per step up the SEARCH_QUALITY_PREFERENCE list
+POPULARITY_WEIGHT = 1.0     # times ln(1 + downloads)
+
+QUALITY_RANK = {
+    quality: len(SEARCH_QUALITY_PREFERENCE) - i
+    for i, quality in enumerate(SEARCH_QUALITY_PREFERENCE)
+}
+
+
+def tokenize(text):
+    """Split text into lower-cased search tokens"""
+    if not text:
+        return []
+    return [tok for tok in TOKEN_SPLIT.split(text.casefold()) if tok]
+
+
+def stem(token):
+    """Light plural stemming so "avenger" finds "Avengers" and "movies" finds "movie", as $text does"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')) and not token.isdigit():
+        return token[:-1]
+    return token
+
+
+def search_terms(text):
+    """Stemmed tokens of text minus stop words - what titles are indexed and queried by"""
+    return {stem(token) for token in tokenize(text) if token not in STOP_WORDS}
+
+
+def normalize_query(query):
+    """Case-fold and collapse whitespace/punctuation so equal searches share one key"""
+    return ' '.join(tokenize(query))
+
+
+class SearchIndex:
+    """Token -> posting list index with ordinal <-> _id mapping"""
+
+    def __init__(self):
+        self._postings = {}      # token -> sorted list of ordinals
+        self._ids = []           # ordinal -> Mongo _id (None once deleted)
+        self._ordinal_of = {}    # Mongo _id -> ordinal
+        self._rank_info = []     # ordinal -> (title token count, quality, year)
+        self._downloads = {}     # ordinal -> popularity counter
+        self._live = 0
+        self._attributes = {field: {} for field in ATTRIBUTE_FIELDS}  # field -> value -> Bitmap
+        self.titles = PrefixIndex()  # as-you-type title lookups for inline mode
+        self.filter_checks = 0   # group messages checked by might_match
+        self.filter_rejects = 0  # ... dropped as chatter before any search
+        self._removed_while_loading = set()
+        self._load_task = None
+        self.ready = False
+        self.loading = False
+
+    def __len__(self):
+        return self._live
+
+    # ============ WRITE PATH ============
+
+    def add(self, file):
+        """Index a single file document. Re-adding a known _id is a no-op."""
+        file_id = file.get('_id')
+        if file_id is None or file_id in self._ordinal_of:
+            return None
+        if self.loading and file_id in self._removed_while_loading:
+            return None
+
+        file_name = file.get('file_name', '')
+        ordinal = len(self._ids)
+        self._ids.append(file_id)
+        self._ordinal_of[file_id] = ordinal
+        self._live += 1
+
+        tokens = tokenize(file_name)
+        terms = search_terms(file_name)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = []
+            posting.append(ordinal)
+        self._rank_info.append((len(terms), file.get('quality'), file.get('year')))
+        if file.get('downloads'):
+            self._downloads[ordinal] = file['downloads']
+        self._index_attributes(ordinal, file)
+        if SPELL_CHECK:
+            spell_checker.add_words(tokens)
+        self.titles.add(ordinal, ' '.join(tokens), {
+            '_id': file_id, 'file_name': file_name, 'file_size': file.get('file_size', 0)
+        }, sort=not self.loading)
+        return ordinal
+
+    def _index_attributes(self, ordinal, file):
+        for field, bitmaps in self._attributes.items():
+            values = file.get(field)
+            if values is None:
+                continue
+            for value in values if isinstance(values, list) else (values,):
+                bitmap = bitmaps.get(value)
+                if bitmap is None:
+                    bitmap = bitmaps[value] = Bitmap()
+                bitmap.add(ordinal)
+
+    def set_attributes(self, file_id, metadata):
+        """Re-index the metadata of a known file (after a backfill) - filter bitmaps and ranking"""
+        ordinal = self._ordinal_of.get(file_id)
+        if ordinal is None:
+            return
+        n_title, quality, year = self._rank_info[ordinal]
+        self._rank_info[ordinal] = (n_title, metadata.get('quality', quality), metadata.get('year', year))
+        for field in metadata.keys() & self._attributes.keys():
+            for bitmap in self._attributes[field].values():
+                bitmap.discard(ordinal)
+        self._index_attributes(ordinal, metadata)
+
+    def record_download(self, file_id):
+        """Bump the popularity signal of a file"""
+        ordinal = self._ordinal_of.get(file_id)
+        if ordinal is not None:
+            self._downloads[ordinal] = self._downloads.get(ordinal, 0) + 1
+
+    def remove(self, file_id):
+        """Drop a file from the index. Its ordinal is skipped at query time."""
+        if self.loading:
+            self._removed_while_loading.add(file_id)
+        ordinal = self._ordinal_of.pop(file_id, None)
+        if ordinal is None:
+            return False
+        self._ids[ordinal] = None
+        self._downloads.pop(ordinal, None)
+        self._live -= 1
+        self.titles.remove(ordinal)
+        return True
+
+    def clear(self):
+        """Forget every file (used by /delete)"""
+        self._postings.clear()
+        self._ids.clear()
+        self._ordinal_of.clear()
+        self._rank_info.clear()
+        self._downloads.clear()
+        self._live = 0
+        for bitmaps in self._attributes.values():
+            bitmaps.clear()
+        self.titles.clear()
+
+    # ============ READ PATH ============
+
+    def search(self, query, limit=None):
+        """
+        Return the ordinals matching the query, best first. Stop words and terms
+        in no title are ignored, as are terms in most titles (mkv, 1080p) unless
+        nothing else is left. Files with every remaining term match; when there
+        are none, files with any of them do, more terms ranking higher.
+        Deleted files are skipped; limit keeps only the best ones.
+        """
+        terms = search_terms(query)
+        postings = {term: self._postings[term] for term in terms if term in self._postings}
+        if not postings:
+            return []
+        if len(postings) > 1:
+            common = self._live * COMMON_TERM_SHARE
+            postings = {t: p for t, p in postings.items() if len(p) <= common} or postings
+
+        lists = sorted(postings.values(), key=len)
+        matches = set(lists[0])
+        for posting in lists[1:]:
+            matches.intersection_update(posting)
+            if not matches:
+                break
+
+        if matches:
+            matched = dict.fromkeys(matches, len(lists))  # ordinal -> query terms in its title
+        else:
+            matched = {}
+            for posting in lists:
+                for ordinal in posting:
+                    matched[ordinal] = matched.get(ordinal, 0) + 1
+
+        ids = self._ids
+        live = {o: n for o, n in matched.items() if ids[o] is not None}
+        return self.rank(live, terms, limit)
+
+    def might_match(self, tokens):
+        """Pre-check against the posting lists: False means no query term is in any title"""
+        stems = [stem(t) for t in tokens if t not in STOP_WORDS]
+        if not stems:
+            return False
+        self.filter_checks += 1
+        passed = any(term in self._postings for term in stems)
+        if not passed:
+            self.filter_rejects += 1
+        return passed
+
+    def filter_stats(self):
+        """Chatter pre-check counters for /stats"""
+        return {
+            'terms': len(self._postings),
+            'checks': self.filter_checks,
+            'rejects': self.filter_rejects
+        }
+
+    def rank(self, matched, query_tokens, limit=None):
+        """
+        Order matches ({ordinal: query tokens matched}) by: number of query
+        tokens matched, then how much of the title they cover (exact titles
+        score highest), year match, preferred quality, popularity, then newest.
+        With a limit only the best `limit` are kept, without sorting the rest.
+        """
+        years = {int(t) for t in query_tokens if len(t) == 4 and t.isdigit()}
+        n_query = len(query_tokens)
+        rank_info = self._rank_info
+        downloads = self._downloads
+
+        def score(ordinal):
+            n_title, quality, year = rank_info[ordinal]
+            hits = matched[ordinal]
+            value = EXACT_TITLE_WEIGHT * hits / max(n_title, n_query)
+            if year and year in years:
+                value += YEAR_MATCH_WEIGHT
+            value += QUALITY_WEIGHT * QUALITY_RANK.get(quality, 0)
+            value += POPULARITY_WEIGHT * math.log1p(downloads.get(ordinal, 0))
+            return (hits, value, ordinal)
+
+        scored = [score(ordinal) for ordinal in matched]
+        if limit is not None and len(scored) > limit:
+            scored.reverse()  # Newest first: equal scores then rarely displace the heap
+            best = heapq.nlargest(limit, scored)
+        else:
+            best = sorted(scored, reverse=True)
+        return [ordinal for _, _, ordinal in best]
+
+    def search_ids(self, query, offset=0, limit=10):
+        """Return (page of Mongo _ids, total matches) for a query"""
+        ordinals = self.search(query)
+        page = ordinals[offset:offset + limit]
+        return [self._ids[o] for o in page], len(ordinals)
+
+    def search_all_ids(self, query, limit=None):
+        """Return every matching Mongo _id (or the best `limit`), best first"""
+        return [self._ids[o] for o in self.search(query, limit)]
+
+    def filter_ids(self, ids, predicate):
+        """
+        Keep the ids (in order) whose file matches every field=value of a
+        metadata_filter predicate - one AND of attribute bitmaps, no Mongo scan.
+        """
+        mask = None
+        for field, value in predicate.items():
+            bitmap = self._attributes.get(field, {}).get(value)
+            if bitmap is None:
+                return []
+            mask = bitmap if mask is None else mask & bitmap
+            if not mask:
+                return []
+        if mask is None:
+            return list(ids)
+
+        ordinal_of = self._ordinal_of
+        return [i for i in ids if ordinal_of.get(i, -1) in mask]
+
+    def facet_counts(self, ids):
+        """Per-value counts of every attribute across ids: popcount(results AND value bitmap)"""
+        ordinal_of = self._ordinal_of
+        results = Bitmap.from_ordinals(ordinal_of[i] for i in ids if i in ordinal_of)
+        counts = {}
+        for field, bitmaps in self._attributes.items():
+            counts[field] = {}
+            for value, bitmap in bitmaps.items():
+                count = results.intersection_count(bitmap)
+                if count:
+                    counts[field][value] = count
+        return counts
+
+    def attribute_stats(self):
+        """Bitmap sizes for /stats"""
+        return {
+            field: {'values': len(bitmaps), 'bytes': sum(b.nbytes() for b in bitmaps.values())}
+            for field, bitmaps in self._attributes.items()
+        }
+
+    def search_titles(self, prefix, offset=0, limit=50):
+        """Files whose normalized title starts with prefix: ([{_id, file_name, file_size}], has_more)"""
+        return self.titles.search(normalize_query(prefix), offset, limit)
+
+    # ============ LOADING ============
+
+    async def load(self, collection):
+        """Build the index from the files collection"""
+        self.loading = True
+        self._removed_while_loading.clear()
+        started = time.monotonic()
+        try:
+            cursor = collection.find({}, INDEX_PROJECTION).sort('_id', 1)
+            async for doc in cursor:
+                self.add(doc)
+            self.ready = True
+            logger.info(
+                f"🔎 Search index loaded: {self._live} files, {len(self._postings)} tokens, "
+                f"{len(spell_checker)} spelling words "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+        except Exception as e:
+            logger.error(f"Error loading search index: {e}")
+        finally:
+            self.loading = False
+            self._removed_while_loading.clear()
+            self.titles.sort()
+
+    def ensure_loading(self, collection):
+        """Start loading in the background once; searches fall back to Mongo until ready"""
+        if self.ready or self._load_task is not None:
+            return
+        self._load_task = asyncio.create_task(self.load(collection))
+
+        def _reset(task):
+            if not self.ready:
+                self._load_task = None
+
+        self._load_task.add_done_callback(_reset)
+
+
+search_index = SearchIndex()
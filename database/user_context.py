@@ -0,0 +1,125 @@
+"""
+Per-update view of one user.
+
+A file tap used to read the user document up to four times (premium check,
+verification check, quota, re-read after the counter bump). UserContext is
+loaded with a single projected read that also registers a new user, answers
+premium / verification / quota / referral questions in memory, and collects
+every write of the update into one combined update_one.
+"""
+
+import logging
+import time
+from pymongo import ReturnDocument
+from database.client import get_database
+from database.entitlements import entitlements, entitlement_from_doc, ENTITLEMENT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_PROJECTION = {
+    '_id': 0, 'user_id': 1, 'premium_expire': 1, 'is_premium': 1,
+    'is_verified': 1, 'verify_time': 1, 'files_sent': 1,
+    'verify_token': 1, 'token_expire': 1, 'points': 1, 'referred_by': 1
+}
+
+
+def new_user_fields(user_id):
+    """Fields written when a user is first seen (same as Database.add_user)"""
+    return {
+        'user_id': user_id,
+        'points': 0,
+        'referral_count': 0,
+        'premium_expire': 0,
+        'joined_at': int(time.time())
+    }
+
+
+class UserContext:
+    """One user's state for the update being handled - read once, written once"""
+
+    def __init__(self, col, user_id, doc):
+        self.col = col
+        self.user_id = user_id
+        self.doc = doc or {}
+        self._set = {}
+        self._inc = {}
+
+    @property
+    def entitlement(self):
+        return entitlement_from_doc(self.doc)
+
+    @property
+    def is_premium(self):
+        return self.entitlement.is_premium()
+
+    @property
+    def is_verified(self):
+        """Same rules as VerifyDB.is_verified: premium users, or a verification still within its window"""
+        return self.entitlement.is_verified()
+
+    @property
+    def files_sent(self):
+        return self.doc.get('files_sent', 0)
+
+    @property
+    def points(self):
+        return self.doc.get('points', 0)
+
+    @property
+    def referred_by(self):
+        return self.doc.get('referred_by')
+
+    def token_matches(self, token):
+        """Same rules as VerifyDB.verify_token, checked against the loaded document"""
+        return self.doc.get('verify_token') == token and int(time.time()) < self.doc.get('token_expire', 0)
+
+    def set(self, **fields):
+        """Queue a $set, visible to the properties right away"""
+        self._set.update(fields)
+        self.doc.update(fields)
+
+    def inc(self, field, amount=1):
+        """Queue an $inc, visible to the properties right away"""
+        self._inc[field] = self._inc.get(field, 0) + amount
+        self.doc[field] = self.doc.get(field, 0) + amount
+
+    async def save(self):
+        """Send every queued write as one update; False if it failed (no-op when nothing changed)"""
+        if not (self._set or self._inc):
+            return True
+        update = {}
+        if self._set:
+            update['$set'] = self._set
+        if self._inc:
+            update['$inc'] = self._inc
+        changed = set(self._set) | set(self._inc)
+        try:
+            await self.col.update_one({'user_id': self.user_id}, update, upsert=True)
+        except Exception as e:
+            logger.error(f"Error saving user {self.user_id}: {e}")
+            entitlements.invalidate(self.user_id)
+            saved = False
+        else:
+            if changed.intersection(ENTITLEMENT_FIELDS):
+                entitlements.remember(self.user_id, self.doc)
+            saved = True
+        self._set, self._inc = {}, {}
+        return saved
+
+
+async def load_user_context(user_id, col=None):
+    """Register the user if new and read their state - one round trip"""
+    col = col if col is not None else get_database()['users']
+    try:
+        doc = await col.find_one_and_update(
+            {'user_id': user_id},
+            {'$setOnInsert': new_user_fields(user_id)},
+            projection=CONTEXT_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        logger.error(f"Error loading user {user_id}: {e}")
+        return UserContext(col, user_id, None)
+    entitlements.remember(user_id, doc)
+    return UserContext(col, user_id, doc)
@@ -1,51 +1,57 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from info import DATABASE_URI, DATABASE_NAME
+from database.client import get_database
+from database.entitlements import entitlements
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+# Fields the user plugins read - documents are never fetched whole
+USER_PROJECTION = {'_id': 0, 'user_id': 1, 'is_premium': 1, 'premium_expire': 1, 'points': 1, 'referred_by': 1}
+USER_ID_PROJECTION = {'_id': 0, 'user_id': 1}
+
 class UserDB:
-    def __init__(self):
-        self.client = AsyncIOMotorClient(DATABASE_URI)
-        self.db = self.client[DATABASE_NAME]
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_database()
         self.col = self.db['users']
 
     async def add_user(self, user_id, name):
         """Add user to database"""
         try:
-            user = await self.col.find_one({'user_id': user_id})
-            if not user:
-                await self.col.insert_one({
+            # One upsert - a find-then-insert lets two concurrent /start create duplicates
+            result = await self.col.update_one(
+                {'user_id': user_id},
+                {'$setOnInsert': {
                     'user_id': user_id,
                     'name': name,
                     'is_premium': False,
                     'premium_expire': 0,
                     'points': 0,
                     'referred_by': None
-                })
-                return True
-            return False
+                }},
+                upsert=True
+            )
+            return result.upserted_id is not None
         except Exception as e:
             logger.error(f"Error adding user: {e}")
             return False
 
-    async def get_user(self, user_id):
+    async def get_user(self, user_id, projection=USER_PROJECTION):
         """Get user by ID"""
-        return await self.col.find_one({'user_id': user_id})
+        return await self.col.find_one({'user_id': user_id}, projection)
 
     async def total_users_count(self):
         """Count total users"""
         return await self.col.count_documents({})
 
-    async def get_all_users(self):
-        """Get all users"""
-        cursor = self.col.find({})
+    async def get_all_users(self, projection=USER_ID_PROJECTION):
+        """Get all users (only user_id unless asked - broadcasts need nothing else)"""
+        cursor = self.col.find({}, projection)
         return await cursor.to_list(length=None)
 
     async def delete_user(self, user_id):
         """Delete user"""
         await self.col.delete_one({'user_id': user_id})
+        entitlements.invalidate(user_id)
 
     # Premium methods
     async def make_premium(self, user_id, expire_time):
@@ -54,10 +60,11 @@ class UserDB:
             {'user_id': user_id},
             {'$set': {'is_premium': True, 'premium_expire': expire_time}}
         )
+        entitlements.invalidate(user_id)
 
     async def is_premium(self, user_id):
         """Check if user is premium"""
-        user = await self.get_user(user_id)
+        user = await self.get_user(user_id, {'_id': 0, 'is_premium': 1, 'premium_expire': 1})
         
         if not user:
             return False
@@ -70,6 +77,7 @@ class UserDB:
                     {'user_id': user_id},
                     {'$set': {'is_premium': False}}
                 )
+                entitlements.invalidate(user_id)
         return False
 
     # Points system
@@ -82,7 +90,7 @@ class UserDB:
 
     async def get_points(self, user_id):
         """Get user points"""
-        user = await self.get_user(user_id)
+        user = await self.get_user(user_id, {'_id': 0, 'points': 1})
         return user.get('points', 0) if user else 0
 
     async def deduct_points(self, user_id, points):
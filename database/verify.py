@@ -6,7 +6,9 @@ Updated with proper verification flow
 import os
 import logging
 from datetime import datetime, timedelta, timezone
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from database.client import get_database
+from database.entitlements import entitlements
 from typing import Optional, Dict
 
 logger = logging.getLogger(__name__)
@@ -17,11 +19,15 @@ if not MONGODB_URL:
     logger.error("❌ DATABASE_URI not found in environment variables!")
     raise ValueError("DATABASE_URI is required")
 
-client = AsyncIOMotorClient(MONGODB_URL)
-DATABASE_NAME = os.getenv("DATABASE_NAME", "MovieFilterBot")
-db = client[DATABASE_NAME]
+db = get_database()
 users_collection = db["users"]
 
+# Fields the verification flow reads - documents are never fetched whole
+VERIFY_PROJECTION = {
+    "_id": 0, "is_premium": 1, "premium_expire": 1, "is_verified": 1, "verify_time": 1,
+    "files_sent": 1, "file_attempts": 1, "verify_token": 1, "token_expire": 1
+}
+
 # IST timezone (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
@@ -38,10 +44,10 @@ except ImportError as e:
 class VerifyDB:
     """Database operations for verification system"""
     
-    async def get_user(self, user_id: int) -> Optional[Dict]:
+    async def get_user(self, user_id: int, projection: Dict = VERIFY_PROJECTION) -> Optional[Dict]:
         """Get user from database"""
         try:
-            return await users_collection.find_one({"user_id": user_id})
+            return await users_collection.find_one({"user_id": user_id}, projection)
         except Exception as e:
             logger.error(f"Error getting user: {e}")
             return None
@@ -49,10 +55,15 @@ class VerifyDB:
     async def is_verified(self, user_id: int) -> bool:
         """Check if user is verified and not expired"""
         try:
+            cached = entitlements.get(user_id)
+            if cached is not None:
+                return cached.is_verified()
+            
             user = await self.get_user(user_id)
             if not user:
                 logger.info(f"🔍 is_verified({user_id}): No user data → False")
                 return False
+            entitlements.remember(user_id, user)
             
             # Premium users are always verified
             if user.get("is_premium", False):
@@ -100,6 +111,7 @@ class VerifyDB:
                 },
                 upsert=True
             )
+            entitlements.invalidate(user_id)
             
             logger.info(f"✅ User {user_id} verification updated at {current_time}")
             return True
@@ -160,14 +172,14 @@ class VerifyDB:
     async def increment_files_sent(self, user_id: int) -> bool:
         """Increment files sent counter for user"""
         try:
-            result = await users_collection.update_one(
+            # One round trip returning only the new count
+            user = await users_collection.find_one_and_update(
                 {"user_id": user_id},
                 {"$inc": {"files_sent": 1}},
-                upsert=True
+                projection={"_id": 0, "files_sent": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
-            
-            # Get updated count
-            user = await self.get_user(user_id)
             new_count = user.get('files_sent', 0) if user else 0
             
             logger.info(f"📈 User {user_id} files_sent incremented to {new_count}")
@@ -192,6 +204,7 @@ class VerifyDB:
                     }
                 }
             )
+            entitlements.invalidate(user_id)
             
             logger.info(f"🗑️ Verification cleared for user {user_id}")
             return True
@@ -200,6 +213,28 @@ class VerifyDB:
             logger.error(f"Error clearing verification: {e}")
             return False
     
+    async def add_verification(self, user_id: int, expire_seconds: int) -> bool:
+        """Admin grant: verify a user for expire_seconds instead of VERIFY_TOKEN_TIMEOUT"""
+        try:
+            # is_verified() measures from verify_time, so back-date it to end at the requested time
+            verify_time = int(datetime.now(IST).timestamp()) + expire_seconds - VERIFY_TOKEN_TIMEOUT
+            await users_collection.update_one(
+                {"user_id": user_id},
+                {"$set": {"is_verified": True, "verify_time": verify_time, "files_sent": 0}},
+                upsert=True
+            )
+            entitlements.invalidate(user_id)
+            logger.info(f"✅ User {user_id} verified by admin for {expire_seconds}s")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error adding verification: {e}")
+            return False
+    
+    async def reset_verification(self, user_id: int) -> bool:
+        """Admin reset - same as clear_verification"""
+        return await self.clear_verification(user_id)
+    
     async def get_verification_info(self, user_id: int) -> Dict:
         """Get detailed verification info for user"""
         try:
@@ -9,6 +9,10 @@ BOT_TOKEN = environ.get("BOT_TOKEN", "")
 # Database
 DATABASE_URI = environ.get("DATABASE_URI", "")
 DATABASE_NAME = environ.get("DATABASE_NAME", "MovieFilterBot")
+MONGO_MAX_POOL_SIZE = int(environ.get("MONGO_MAX_POOL_SIZE", "50"))  # One pool shared by every plugin
+MONGO_MIN_POOL_SIZE = int(environ.get("MONGO_MIN_POOL_SIZE", "5"))  # Warm connections kept open
+MONGO_MAX_IDLE_MS = int(environ.get("MONGO_MAX_IDLE_MS", "300000"))  # Close connections idle for 5 minutes
+MONGO_COMPRESSORS = environ.get("MONGO_COMPRESSORS", "zlib")  # zlib / zstd / snappy (comma separated, "" to disable)
 
 # Admin and channels
 ADMINS = [int(admin) if admin.isdigit() else admin for admin in environ.get('ADMINS', '').split()]
@@ -59,7 +63,28 @@ AUTO_DELETE_TIME = int(environ.get("AUTO_DELETE_TIME", "600"))  # 10 minutes
 # Search settings
 IMDB = environ.get("IMDB", "True").lower() in ["true", "yes", "1"]
 SPELL_CHECK = environ.get("SPELL_CHECK", "True").lower() in ["true", "yes", "1"]
+SPELL_CHECK_MAX_WORDS = int(environ.get("SPELL_CHECK_MAX_WORDS", "50000"))  # Bounds the correction dictionary
 MAX_LIST_ELM = int(environ.get("MAX_LIST_ELM", "10"))
+GROUP_SEARCH_MIN_CHARS = int(environ.get("GROUP_SEARCH_MIN_CHARS", "3"))
+GROUP_SEARCH_MAX_CHARS = int(environ.get("GROUP_SEARCH_MAX_CHARS", "100"))  # Longer group texts are chat, not titles
+GROUP_SEARCH_MAX_WORDS = int(environ.get("GROUP_SEARCH_MAX_WORDS", "10"))
+SEARCH_INDEX = environ.get("SEARCH_INDEX", "True").lower() in ["true", "yes", "1"]  # In-memory title index (falls back to Mongo $text)
+SEARCH_CACHE_SIZE = int(environ.get("SEARCH_CACHE_SIZE", "2000"))  # Cached query pages
+SEARCH_CACHE_TTL = int(environ.get("SEARCH_CACHE_TTL", "300"))  # 5 minutes
+SEARCH_COUNT_MODE = environ.get("SEARCH_COUNT_MODE", "facet").lower()  # facet / capped / exact; capped also bounds search session results
+SEARCH_COUNT_CAP = int(environ.get("SEARCH_COUNT_CAP", "1000"))  # "capped" mode shows 1000+ beyond this
+INLINE_CACHE_TIME = int(environ.get("INLINE_CACHE_TIME", "300"))  # Telegram-side cache for inline answers
+INLINE_DEBOUNCE = float(environ.get("INLINE_DEBOUNCE", "0.4"))  # Seconds to wait for the user to stop typing
+SEARCH_QUALITY_PREFERENCE = environ.get("SEARCH_QUALITY_PREFERENCE", "1080p 720p 2160p 480p 360p").split()  # Ranking: preferred first
+SEARCH_SESSION_SIZE = int(environ.get("SEARCH_SESSION_SIZE", "5000"))  # Search sessions kept in memory for buttons
+SEARCH_SESSION_TTL = int(environ.get("SEARCH_SESSION_TTL", "3600"))  # 1 hour
+SEARCH_SESSION_MONGO = environ.get("SEARCH_SESSION_MONGO", "False").lower() in ["true", "yes", "1"]  # Keep sessions across restarts
+RESULT_PAGE_MAX_CHARS = int(environ.get("RESULT_PAGE_MAX_CHARS", "4096"))  # Telegram message limit
+RESULT_PAGE_MAX_BYTES = int(environ.get("RESULT_PAGE_MAX_BYTES", "12288"))  # UTF-8 budget per result message
+PREFETCH_NEXT_PAGE = environ.get("PREFETCH_NEXT_PAGE", "True").lower() in ["true", "yes", "1"]  # Render Next in the background
+PREFETCH_CONCURRENCY = int(environ.get("PREFETCH_CONCURRENCY", "4"))  # Background page renders at once
+ENTITLEMENT_CACHE_SIZE = int(environ.get("ENTITLEMENT_CACHE_SIZE", "20000"))  # Users whose premium/verified state is kept in memory
+ENTITLEMENT_CACHE_TTL = int(environ.get("ENTITLEMENT_CACHE_TTL", "900"))  # Re-read after 15 min in case another process changed it
 
 # Single character mode
 SINGLE_BUTTON = environ.get("SINGLE_BUTTON", "True").lower() in ["true", "yes", "1"]
@@ -1,7 +1,13 @@
 from pyrogram import Client, filters, enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from database.database import Database
+from database.database import Database, search_cache, search_flight
+from database.search_index import search_index
+from utils.message_classifier import classifier_stats
+from utils.result_renderer import page_cache
+from utils import prefetch
+from database.client import client_stats
 from database.users import UserDB
+from database.entitlements import entitlements
 from info import ADMINS, LOG_CHANNEL
 import asyncio
 
@@ -13,6 +19,19 @@ async def stats_command(client, message):
     total_users = await user_db.total_users_count()
     total_groups = await db.total_groups_count()
     total_files = await db.total_files_count()
+    cache = search_cache.stats()
+    flight = search_flight.stats()
+    pages = page_cache.stats()
+    ahead = prefetch.stats()
+    pool = client_stats()
+    access = entitlements.stats()
+    chatter = search_index.filter_stats()
+    bitmaps = search_index.attribute_stats()
+    bitmap_values = sum(b['values'] for b in bitmaps.values())
+    bitmap_kb = sum(b['bytes'] for b in bitmaps.values()) / 1024
+    skipped = ", ".join(
+        f"{reason}: {count}" for reason, count in classifier_stats.most_common() if reason != 'accepted'
+    ) or "none"
     
     text = f"""
 📊 Bot Statistics
@@ -21,6 +40,17 @@ async def stats_command(client, message):
 👨‍👩‍👧‍👦 Total Groups: {total_groups}
 📁 Total Files: {total_files}
 
+🔌 Mongo Pool: {pool['open']} open, {pool['in_use']} in use (max {pool['max_pool_size']}) | Checkouts: {pool.get('checkouts', 0)}
+🔎 Search Cache: {cache['size']}/{cache['maxsize']} entries
+✅ Hits: {cache['hits']} | ❌ Misses: {cache['misses']} ({cache['hit_rate']:.0%} hit rate)
+🖼️ Rendered Pages: {pages['size']} | Reused: {pages['hits']} ({pages['hit_rate']:.0%})
+⏩ Prefetched Pages: {ahead.get('completed', 0)} | Used: {ahead.get('hits', 0)} ({ahead['hit_rate']:.0%} of page turns)
+🎫 Entitlement Cache: {access['size']} users | Hits: {access['hits']} ({access['hit_rate']:.0%}) | Invalidated: {access['invalidations']}
+🔗 Coalesced: {flight['coalesced']}/{flight['calls']} searches ({flight['coalesce_rate']:.0%})
+🧹 Chatter Dropped: {chatter['rejects']}/{chatter['checks']} | Title Terms: {chatter['terms']}
+🧮 Filter Bitmaps: {bitmap_values} values, {bitmap_kb:.0f} KB
+🚦 Group Texts Searched: {classifier_stats['accepted']} | Skipped: {skipped}
+
 Bot: @{client.username}
 Owner: @Siva9789
 """
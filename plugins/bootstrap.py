@@ -0,0 +1,27 @@
+from pyrogram import Client, filters
+from database.migrations import ensure_migrations, migration_status
+from info import ADMINS
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# bot.py has no startup hook for plugins, so the first update of the process
+# starts the index/migration runner (in the background - nothing waits for it)
+@Client.on_raw_update(group=-1)
+async def bootstrap_on_first_update(client, update, users, chats):
+    ensure_migrations()
+
+
+@Client.on_message(filters.command("migrations") & filters.user(ADMINS))
+async def migrations_command(client, message):
+    """Show which index/data migrations have been applied"""
+    ensure_migrations()
+    lines = []
+    for version, description, applied_at in await migration_status():
+        state = f"✅ {applied_at:%Y-%m-%d %H:%M}" if applied_at else "⏳ pending"
+        lines.append(f"{version}. {description} - {state}")
+    await message.reply("🧱 Migrations\n\n" + "\n".join(lines))
+
+
+logger.info("✅ BOOTSTRAP PLUGIN LOADED")
@@ -1,6 +1,7 @@
-from pyrogram import Client, filters
+from pyrogram import Client, filters, enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database.database import Database
+from database.group_registry import group_registry
 from info import ADMINS
 
 db = Database()
@@ -29,3 +30,37 @@ async def disconnect_group(client, message):
     await db.delete_group(group_id)
     await message.reply("✅ <b><i>Group disconnected!</i></b>", parse_mode="html")
     
+
+
+@Client.on_message(filters.command("groupset") & filters.group & filters.user(ADMINS))
+async def group_settings(client, message):
+    """/groupset page_size <n> | auto_delete <on|off> [seconds]"""
+    usage = "Usage: /groupset page_size <5-50>\n/groupset auto_delete <on|off> [seconds]"
+    if len(message.command) < 3:
+        await message.reply(usage)
+        return
+
+    group_id = message.chat.id
+    group_registry.ensure_loading(db.grp)
+    connected = group_id in group_registry if group_registry.ready else await db.get_group(group_id, {'_id': 1})
+    if not connected:
+        await message.reply("❌ Group is not connected! Use /connect first.")
+        return
+
+    key, value = message.command[1].lower(), message.command[2].lower()
+    try:
+        if key == "page_size":
+            settings = {'page_size': max(5, min(50, int(value)))}
+        elif key == "auto_delete":
+            settings = {'auto_delete': value == "on"}
+            if len(message.command) > 3:
+                settings['auto_delete_time'] = max(10, int(message.command[3]))
+        else:
+            await message.reply(usage)
+            return
+    except ValueError:
+        await message.reply(usage)
+        return
+
+    await db.update_group_settings(group_id, settings)
+    await message.reply(f"✅ Group settings updated: <code>{settings}</code>", parse_mode=enums.ParseMode.HTML)
@@ -82,7 +82,7 @@ async def confirm_delete_file(client, query):
         else:
             mongo_id = file_id
         
-        file_data = await db.get_file(mongo_id)
+        file_data = await db.get_file(mongo_id, {'file_name': 1, 'channel_id': 1, 'message_id': 1})
         
         if not file_data:
             await query.answer("❌ File not found!", show_alert=True)
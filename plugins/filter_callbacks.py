@@ -1,127 +1,66 @@
 from pyrogram import Client, filters, enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database.database import Database
-from utils.file_properties import get_size
+from database.group_registry import group_registry
+from utils.result_renderer import render_results
+from utils.prefetch import prefetch_next_page
+from utils.search_session import callback_session, load_results, set_filters, set_page, session_facets
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 db = Database()
 
-# Language keywords for filtering
-LANGUAGE_KEYWORDS = {
-    'Tamil': ['tamil', 'tam', '.tam.', '[tam]', 'தமிழ்', 'tmv', 'tn'],
-    'Telugu': ['telugu', 'tel', '.tel.', '[tel]', 'తెలుగు', 'tlu'],
-    'Hindi': ['hindi', 'hin', '.hin.', '[hin]', 'हिन्दी', 'hnd'],
-    'Malayalam': ['malayalam', 'mal', '.mal.', '[mal]', 'മലയാളം', 'mlm'],
-    'Kannada': ['kannada', 'kan', '.kan.', '[kan]', 'ಕನ್ನಡ', 'knd'],
-    'English': ['english', 'eng', '.eng.', '[eng]', 'dual audio']
-}
-
-# Quality keywords
-QUALITY_KEYWORDS = {
-    '2160p': ['2160p', '4k', 'uhd', '2160'],
-    '1080p': ['1080p', 'fhd', 'fullhd', '1080'],
-    '720p': ['720p', 'hd', '720'],
-    '480p': ['480p', 'sd', '480'],
-    '360p': ['360p', '360']
-}
-
-
-def filter_files(files, language=None, quality=None, season=None, episode=None):
-    """Filter files by language, quality, season and episode"""
-    if not files:
-        return []
-    
-    filtered = []
-    
-    for file in files:
-        original_caption = file.get('caption', '').lower()
-        file_name = file.get('file_name', '').lower()
-        search_text = f"{original_caption} {file_name}"
-        
-        match = True
-        
-        # Language filter
-        if language and language != 'All':
-            keywords = LANGUAGE_KEYWORDS.get(language, [])
-            lang_found = any(kw.lower() in search_text for kw in keywords)
-            if not lang_found:
-                match = False
-        
-        # Quality filter
-        if quality and quality != 'All':
-            keywords = QUALITY_KEYWORDS.get(quality, [])
-            qual_found = any(kw.lower() in search_text for kw in keywords)
-            if not qual_found:
-                match = False
-        
-        # Season filter (e.g., S01, S02, Season 1)
-        if season and season != 'All':
-            season_patterns = [
-                f's{season}',  # S01
-                f's0{season}',  # S01
-                f'season {season}',  # Season 1
-                f'season{season}',  # Season1
-            ]
-            season_found = any(pattern in search_text for pattern in season_patterns)
-            if not season_found:
-                match = False
-        
-        # Episode filter (e.g., E01, E02, Episode 1)
-        if episode and episode != 'All':
-            episode_patterns = [
-                f'e{episode}',  # E01
-                f'e0{episode}',  # E01
-                f'episode {episode}',  # Episode 1
-                f'episode{episode}',  # Episode1
-                f'ep{episode}',  # Ep01
-            ]
-            episode_found = any(pattern in search_text for pattern in episode_patterns)
-            if not episode_found:
-                match = False
-        
-        if match:
-            filtered.append(file)
-    
-    logger.info(f"🎬 Filtered: {len(filtered)}/{len(files)} files")
-    return filtered
+bot_username = None
 
 
 async def get_bot_username(client):
-    """Get bot username"""
-    try:
-        me = await client.get_me()
-        return me.username
-    except:
-        return None
+    """Get bot username (looked up once)"""
+    global bot_username
+    if not bot_username:
+        try:
+            me = await client.get_me()
+            bot_username = me.username
+        except:
+            return None
+    return bot_username
+
 
+# Menu entries: (label, callback value)
+LANGUAGE_OPTIONS = [
+    ("🇮🇳 Tamil", "Tamil"), ("🇬🇧 English", "English"),
+    ("🇮🇳 Hindi", "Hindi"), ("🇮🇳 Telugu", "Telugu"),
+    ("🇮🇳 Malayalam", "Malayalam"), ("🇮🇳 Kannada", "Kannada")
+]
+QUALITY_OPTIONS = [
+    ("🎬 2160p 4K", "2160p"), ("📺 1080p", "1080p"), ("📺 720p", "720p"),
+    ("📱 480p", "480p"), ("📱 360p", "360p")
+]
+MAX_MENU_BUTTONS = 30  # seasons/episodes shown per menu
 
-def clean_caption(caption):
-    """Clean caption for display"""
-    if not caption:
-        return caption
-    caption = re.sub(r'@\w+', '', caption)
-    caption = re.sub(r'(https?://)?(t\.me|telegram\.me)/\S+', '', caption)
-    caption = re.sub(r'\s+', ' ', caption)
-    return caption.strip()
+
+def build_option_rows(options, counts, prefix, token, per_row):
+    """Buttons for options that have results, with their counts, `per_row` to a row"""
+    buttons = [
+        InlineKeyboardButton(f"{label} ({counts[value]})", callback_data=f"{prefix}_{value}#{token}")
+        for label, value in options if counts.get(value)
+    ]
+    return [buttons[i:i + per_row] for i in range(0, len(buttons), per_row)]
 
 
 # Language Filter Menu
 @Client.on_callback_query(filters.regex(r"^lang#"))
 async def language_menu(client, query):
     """Show language selection menu"""
-    search = query.data.split("#")[1]
-    
-    lang_buttons = [
-        [InlineKeyboardButton("🇮🇳 Tamil", callback_data=f"setlang_Tamil#{search}"),
-         InlineKeyboardButton("🇬🇧 English", callback_data=f"setlang_English#{search}")],
-        [InlineKeyboardButton("🇮🇳 Hindi", callback_data=f"setlang_Hindi#{search}"),
-         InlineKeyboardButton("🇮🇳 Telugu", callback_data=f"setlang_Telugu#{search}")],
-        [InlineKeyboardButton("🇮🇳 Malayalam", callback_data=f"setlang_Malayalam#{search}"),
-         InlineKeyboardButton("🇮🇳 Kannada", callback_data=f"setlang_Kannada#{search}")],
-        [InlineKeyboardButton("🌐 All Languages", callback_data=f"setlang_All#{search}")],
-        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{search}")]
+    session = await callback_session(db, query)
+    if not session:
+        return
+    token = session.token
+    facets = await session_facets(db, session, 'language')
+    
+    lang_buttons = build_option_rows(LANGUAGE_OPTIONS, facets['languages'], "setlang", token, 2)
+    lang_buttons += [
+        [InlineKeyboardButton("🌐 All Languages", callback_data=f"setlang_All#{token}")],
+        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{token}")]
     ]
     
     await query.message.edit_reply_markup(
@@ -134,16 +73,16 @@ async def language_menu(client, query):
 @Client.on_callback_query(filters.regex(r"^qual#"))
 async def quality_menu(client, query):
     """Show quality selection menu"""
-    search = query.data.split("#")[1]
-    
-    qual_buttons = [
-        [InlineKeyboardButton("🎬 2160p 4K", callback_data=f"setqual_2160p#{search}"),
-         InlineKeyboardButton("📺 1080p", callback_data=f"setqual_1080p#{search}")],
-        [InlineKeyboardButton("📺 720p", callback_data=f"setqual_720p#{search}"),
-         InlineKeyboardButton("📱 480p", callback_data=f"setqual_480p#{search}")],
-        [InlineKeyboardButton("📱 360p", callback_data=f"setqual_360p#{search}"),
-         InlineKeyboardButton("🌐 All Quality", callback_data=f"setqual_All#{search}")],
-        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{search}")]
+    session = await callback_session(db, query)
+    if not session:
+        return
+    token = session.token
+    facets = await session_facets(db, session, 'quality')
+    
+    qual_buttons = build_option_rows(QUALITY_OPTIONS, facets['quality'], "setqual", token, 2)
+    qual_buttons += [
+        [InlineKeyboardButton("🌐 All Quality", callback_data=f"setqual_All#{token}")],
+        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{token}")]
     ]
     
     await query.message.edit_reply_markup(
@@ -156,21 +95,17 @@ async def quality_menu(client, query):
 @Client.on_callback_query(filters.regex(r"^season#"))
 async def season_menu(client, query):
     """Show season selection menu"""
-    search = query.data.split("#")[1]
-    
-    season_buttons = [
-        [InlineKeyboardButton("S1", callback_data=f"setseason_1#{search}"),
-         InlineKeyboardButton("S2", callback_data=f"setseason_2#{search}"),
-         InlineKeyboardButton("S3", callback_data=f"setseason_3#{search}")],
-        [InlineKeyboardButton("S4", callback_data=f"setseason_4#{search}"),
-         InlineKeyboardButton("S5", callback_data=f"setseason_5#{search}"),
-         InlineKeyboardButton("S6", callback_data=f"setseason_6#{search}")],
-        [InlineKeyboardButton("S7", callback_data=f"setseason_7#{search}"),
-         InlineKeyboardButton("S8", callback_data=f"setseason_8#{search}"),
-         InlineKeyboardButton("S9", callback_data=f"setseason_9#{search}")],
-        [InlineKeyboardButton("S10", callback_data=f"setseason_10#{search}"),
-         InlineKeyboardButton("🌐 All Seasons", callback_data=f"setseason_All#{search}")],
-        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{search}")]
+    session = await callback_session(db, query)
+    if not session:
+        return
+    token = session.token
+    facets = await session_facets(db, session, 'season')
+    
+    seasons = sorted(facets['season'])[:MAX_MENU_BUTTONS]
+    season_buttons = build_option_rows([(f"S{n}", n) for n in seasons], facets['season'], "setseason", token, 3)
+    season_buttons += [
+        [InlineKeyboardButton("🌐 All Seasons", callback_data=f"setseason_All#{token}")],
+        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{token}")]
     ]
     
     await query.message.edit_reply_markup(
@@ -183,20 +118,18 @@ async def season_menu(client, query):
 @Client.on_callback_query(filters.regex(r"^episode#"))
 async def episode_menu(client, query):
     """Show episode selection menu"""
-    search = query.data.split("#")[1]
-    
-    episode_buttons = []
-    # Episodes 1-12 in 4 rows
-    for i in range(0, 12, 3):
-        row = []
-        for j in range(3):
-            ep_num = i + j + 1
-            if ep_num <= 12:
-                row.append(InlineKeyboardButton(f"E{ep_num:02d}", callback_data=f"setepisode_{ep_num}#{search}"))
-        episode_buttons.append(row)
-    
-    episode_buttons.append([InlineKeyboardButton("🌐 All Episodes", callback_data=f"setepisode_All#{search}")])
-    episode_buttons.append([InlineKeyboardButton("◀️ Back", callback_data=f"back#{search}")])
+    session = await callback_session(db, query)
+    if not session:
+        return
+    token = session.token
+    facets = await session_facets(db, session, 'episode')
+    
+    episodes = sorted(facets['episode'])[:MAX_MENU_BUTTONS]
+    episode_buttons = build_option_rows([(f"E{n:02d}", n) for n in episodes], facets['episode'], "setepisode", token, 3)
+    episode_buttons += [
+        [InlineKeyboardButton("🌐 All Episodes", callback_data=f"setepisode_All#{token}")],
+        [InlineKeyboardButton("◀️ Back", callback_data=f"back#{token}")]
+    ]
     
     await query.message.edit_reply_markup(
         reply_markup=InlineKeyboardMarkup(episode_buttons)
@@ -204,63 +137,52 @@ async def episode_menu(client, query):
     await query.answer("📋 Select episode")
 
 
+def filters_label(active):
+    """Header label of the active filters ({'language': 'Tamil', 'season': '2'} -> 'Tamil S2')"""
+    parts = [active[field] for field in ('language', 'quality') if field in active]
+    if 'season' in active:
+        parts.append(f"S{active['season']}")
+    if 'episode' in active:
+        parts.append(f"E{active['episode']}")
+    return ' '.join(parts) or None
+
+
+async def show_filtered_results(client, query, session, field, value, found_label, missing_label):
+    """Combine field=value with the session's active filters ('All' clears it) and show the first page"""
+    active = {**session.filters, field: value}
+    if value == 'All':
+        active.pop(field)
+    await set_filters(db, session, active)
+    per_page = group_registry.page_size(query.message.chat.id)
+    
+    bot_username = await get_bot_username(client)
+    file_text, markup, _ = await render_results(
+        db, session, 0, per_page, session.total, bot_username,
+        label=found_label, missing_label=missing_label
+    )
+    
+    await query.message.edit_text(
+        file_text,
+        reply_markup=markup,
+        parse_mode=enums.ParseMode.HTML,
+        disable_web_page_preview=True
+    )
+    prefetch_next_page(db, session, 0, per_page, session.total, bot_username)
+
+
 # Apply Language Filter
 @Client.on_callback_query(filters.regex(r"^setlang_"))
 async def set_language_filter(client, query):
     """Apply language filter"""
-    data = query.data.split("#")
-    language = data[0].replace("setlang_", "")
-    search = data[1]
+    session = await callback_session(db, query)
+    if not session:
+        return
+    language = query.data.split("#")[0].replace("setlang_", "")
     
     logger.info(f"🎬 Filtering by language: {language}")
     
-    files, total = await db.search_files(search)
-    
-    if language != 'All':
-        filtered_files = filter_files(files, language=language)
-    else:
-        filtered_files = files
-    
-    bot_username = await get_bot_username(client)
-    
-    if filtered_files:
-        file_text = f"📁 Found {len(filtered_files)} {language} files for `{search}`\n\n"
-        
-        for file in filtered_files[:10]:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error: {e}")
-    else:
-        file_text = f"❌ No {language} files found for `{search}`"
-    
-    file_text += f"\n🎬 Join: @movies_magic_club3"
-    
-    buttons = [
-        [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-         InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-        [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-         InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-        [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url="https://t.me/REAL_TERABOX_PRO_bot")],
-        [InlineKeyboardButton("❌ Close", callback_data="close")]
-    ]
-    
     try:
-        await query.message.edit_text(
-            file_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=enums.ParseMode.HTML,
-            disable_web_page_preview=True
-        )
+        await show_filtered_results(client, query, session, 'language', language, language, language)
         await query.answer(f"✅ Showing {language} files", show_alert=False)
     except Exception as e:
         logger.error(f"Error: {e}")
@@ -271,57 +193,13 @@ async def set_language_filter(client, query):
 @Client.on_callback_query(filters.regex(r"^setqual_"))
 async def set_quality_filter(client, query):
     """Apply quality filter"""
-    data = query.data.split("#")
-    quality = data[0].replace("setqual_", "")
-    search = data[1]
-    
-    files, total = await db.search_files(search)
-    
-    if quality != 'All':
-        filtered_files = filter_files(files, quality=quality)
-    else:
-        filtered_files = files
-    
-    bot_username = await get_bot_username(client)
-    
-    if filtered_files:
-        file_text = f"📁 Found {len(filtered_files)} {quality} files for `{search}`\n\n"
-        
-        for file in filtered_files[:10]:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error: {e}")
-    else:
-        file_text = f"❌ No {quality} files found for `{search}`"
-    
-    file_text += f"\n🎬 Join: @movies_magic_club3"
-    
-    buttons = [
-        [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-         InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-        [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-         InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-        [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url="https://t.me/REAL_TERABOX_PRO_bot")],
-        [InlineKeyboardButton("❌ Close", callback_data="close")]
-    ]
+    session = await callback_session(db, query)
+    if not session:
+        return
+    quality = query.data.split("#")[0].replace("setqual_", "")
     
     try:
-        await query.message.edit_text(
-            file_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=enums.ParseMode.HTML,
-            disable_web_page_preview=True
-        )
+        await show_filtered_results(client, query, session, 'quality', quality, quality, quality)
         await query.answer(f"✅ Showing {quality} files", show_alert=False)
     except Exception as e:
         await query.answer("❌ Error filtering", show_alert=True)
@@ -331,58 +209,15 @@ async def set_quality_filter(client, query):
 @Client.on_callback_query(filters.regex(r"^setseason_"))
 async def set_season_filter(client, query):
     """Apply season filter"""
-    data = query.data.split("#")
-    season = data[0].replace("setseason_", "")
-    search = data[1]
-    
-    files, total = await db.search_files(search)
+    session = await callback_session(db, query)
+    if not session:
+        return
+    season = query.data.split("#")[0].replace("setseason_", "")
     
-    if season != 'All':
-        filtered_files = filter_files(files, season=season)
-    else:
-        filtered_files = files
-    
-    bot_username = await get_bot_username(client)
-    
-    if filtered_files:
-        season_text = f"S{season}" if season != 'All' else 'All Seasons'
-        file_text = f"📁 Found {len(filtered_files)} {season_text} files for `{search}`\n\n"
-        
-        for file in filtered_files[:10]:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error: {e}")
-    else:
-        file_text = f"❌ No Season {season} files found for `{search}`"
-    
-    file_text += f"\n🎬 Join: @movies_magic_club3"
-    
-    buttons = [
-        [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-         InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-        [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-         InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-        [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url="https://t.me/REAL_TERABOX_PRO_bot")],
-        [InlineKeyboardButton("❌ Close", callback_data="close")]
-    ]
+    season_text = f"S{season}" if season != 'All' else 'All Seasons'
     
     try:
-        await query.message.edit_text(
-            file_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=enums.ParseMode.HTML,
-            disable_web_page_preview=True
-        )
+        await show_filtered_results(client, query, session, 'season', season, season_text, f"Season {season}")
         await query.answer(f"✅ Showing Season {season}", show_alert=False)
     except Exception as e:
         await query.answer("❌ Error filtering", show_alert=True)
@@ -392,58 +227,15 @@ async def set_season_filter(client, query):
 @Client.on_callback_query(filters.regex(r"^setepisode_"))
 async def set_episode_filter(client, query):
     """Apply episode filter"""
-    data = query.data.split("#")
-    episode = data[0].replace("setepisode_", "")
-    search = data[1]
-    
-    files, total = await db.search_files(search)
-    
-    if episode != 'All':
-        filtered_files = filter_files(files, episode=episode)
-    else:
-        filtered_files = files
-    
-    bot_username = await get_bot_username(client)
-    
-    if filtered_files:
-        episode_text = f"E{episode}" if episode != 'All' else 'All Episodes'
-        file_text = f"📁 Found {len(filtered_files)} {episode_text} files for `{search}`\n\n"
-        
-        for file in filtered_files[:10]:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error: {e}")
-    else:
-        file_text = f"❌ No Episode {episode} files found for `{search}`"
+    session = await callback_session(db, query)
+    if not session:
+        return
+    episode = query.data.split("#")[0].replace("setepisode_", "")
     
-    file_text += f"\n🎬 Join: @movies_magic_club3"
-    
-    buttons = [
-        [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-         InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-        [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-         InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-        [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url="https://t.me/REAL_TERABOX_PRO_bot")],
-        [InlineKeyboardButton("❌ Close", callback_data="close")]
-    ]
+    episode_text = f"E{episode}" if episode != 'All' else 'All Episodes'
     
     try:
-        await query.message.edit_text(
-            file_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=enums.ParseMode.HTML,
-            disable_web_page_preview=True
-        )
+        await show_filtered_results(client, query, session, 'episode', episode, episode_text, f"Episode {episode}")
         await query.answer(f"✅ Showing Episode {episode}", show_alert=False)
     except Exception as e:
         await query.answer("❌ Error filtering", show_alert=True)
@@ -452,48 +244,35 @@ async def set_episode_filter(client, query):
 # Back to Results
 @Client.on_callback_query(filters.regex(r"^back#"))
 async def back_to_results(client, query):
-    """Go back to original results"""
-    search = query.data.split("#")[1]
-    
-    files, total = await db.search_files(search)
-    
-    bot_username = await get_bot_username(client)
-    
-    file_text = f"📁 Found {total} files for `{search}`\n\n"
+    """Close a filter menu: show the current (filtered) results again"""
+    session = await callback_session(db, query)
+    if not session:
+        return
     
-    for file in files[:10]:
-        try:
-            file_id = str(file.get('_id', ''))
-            original_caption = file.get('caption', '')
-            file_name = file.get('file_name', 'Unknown')
-            display_name = original_caption if original_caption else file_name
-            cleaned_name = clean_caption(display_name)
-            file_size = get_size(file.get('file_size', 0))
-            
-            deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-            clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-            file_text += f"{clickable_text}\n\n"
-        except Exception as e:
-            logger.error(f"Error: {e}")
-    
-    file_text += f"🎬 Join: @movies_magic_club3"
-    
-    buttons = [
-        [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-         InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-        [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-         InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-        [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url="https://t.me/REAL_TERABOX_PRO_bot")],
-        [InlineKeyboardButton("❌ Close", callback_data="close")]
-    ]
-    
-    await query.message.edit_text(
-        file_text,
-        reply_markup=InlineKeyboardMarkup(buttons),
-        parse_mode=enums.ParseMode.HTML,
-        disable_web_page_preview=True
-    )
-    await query.answer("🔙 Back to all results")
+    try:
+        # The menu only replaced the keyboard - keep every active filter and the page
+        await load_results(db, session)
+        per_page = group_registry.page_size(query.message.chat.id)
+        
+        bot_username = await get_bot_username(client)
+        label = filters_label(session.filters)
+        file_text, markup, page = await render_results(
+            db, session, session.page, per_page, session.total, bot_username,
+            label=label, missing_label=label
+        )
+        set_page(db, session, page)
+        
+        await query.message.edit_text(
+            file_text,
+            reply_markup=markup,
+            parse_mode=enums.ParseMode.HTML,
+            disable_web_page_preview=True
+        )
+        await query.answer("🔙 Back to results")
+        prefetch_next_page(db, session, page, per_page, session.total, bot_username)
+    except Exception as e:
+        logger.error(f"Back to results error: {e}")
+        await query.answer("❌ Error loading results", show_alert=True)
 
 
 logger.info("✅ FILTER CALLBACKS WITH SEASON & EPISODE LOADED")
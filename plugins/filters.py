@@ -1,14 +1,24 @@
 from pyrogram import Client, filters, enums
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database.database import Database
+from database.group_registry import group_registry
 from database.verify import VerifyDB
+from database.user_context import load_user_context
+from database.entitlements import entitlements
 from bson import ObjectId
-from info import ADMINS, VERIFY_TUTORIAL, CUSTOM_FILE_CAPTION, FREE_FILE_LIMIT, AUTO_DELETE, AUTO_DELETE_TIME, REFER_POINT
+from database.search_index import search_index, tokenize
+from info import ADMINS, VERIFY_TUTORIAL, CUSTOM_FILE_CAPTION, FREE_FILE_LIMIT, AUTO_DELETE, AUTO_DELETE_TIME, REFER_POINT, SPELL_CHECK
 from utils.verification import generate_verify_token, create_universal_shortlink
 from config import Config
 from utils.file_properties import get_size
+from utils.search_session import open_session, callback_session, load_results, set_page, session_facets
+from utils.spell_check import spell_checker
+from utils.message_classifier import classify_group_message
+from utils.result_renderer import render_results, YOUR_CHANNEL, YOUR_CHANNEL_LINK, RARE_VIDEOS_LINK
+from utils.prefetch import prefetch_next_page, record_page_view
+from utils.caption_cleaner import display_name
 import logging
-import re
+import time
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -19,58 +29,53 @@ verify_db = VerifyDB()
 # Get bot username (set on startup)
 bot_username = None
 
-# Your channel info
-YOUR_CHANNEL = "@movies_magic_club3"
-YOUR_CHANNEL_LINK = "https://t.me/movies_magic_club3"
-RARE_VIDEOS_LINK = "https://t.me/REAL_TERABOX_PRO_bot"
 
-
-def clean_caption(caption):
-    """Remove other channel links and mentions from caption"""
-    if not caption:
-        return caption
-    
-    caption = re.sub(r'@\w+', '', caption)
-    caption = re.sub(r'(https?://)?(t\.me|telegram\.me)/\S+', '', caption)
-    
-    spam_words = [
-        'join', 'subscribe', 'channel', 'group', 'follow',
-        'movie', 'download', 'here', 'now', 'free', 'latest',
-        '👉', '⚡', '🎬', '📢', '▶️', '🔥', '✅'
-    ]
+async def search_with_correction(search):
+    """
+    Open a search session holding every ranked result id, retrying once with the
+    best spelling correction when nothing matches. Returns (session, corrected);
+    the session is None when nothing matched.
+    """
+    session = await open_session(db, search)
+    if session or not SPELL_CHECK:
+        return session, None
     
-    for word in spam_words:
-        caption = re.sub(rf'\b{word}\b', '', caption, flags=re.IGNORECASE)
+    corrected = spell_checker.correct_query(tokenize(search))
+    if not corrected:
+        return None, None
     
-    caption = re.sub(r'\s+', ' ', caption)
-    caption = caption.strip(' .-_|•~')
+    session = await open_session(db, corrected)
+    if not session:
+        return None, None
     
-    return caption
+    logger.info(f"🔤 Corrected '{search}' → '{corrected}'")
+    return session, corrected
 
 
-async def process_referral(new_user_id, referrer_id):
-    """Process referral when new user joins via referral link"""
+async def process_referral(ctx, referrer_id):
+    """
+    Process referral when new user joins via referral link.
+    Returns the referrer's new point total, or None when nothing was credited.
+    """
     try:
-        if new_user_id == referrer_id:
-            return False
+        if ctx.user_id == referrer_id or ctx.referred_by:
+            return None
         
-        user_data = await db.get_user(new_user_id)
-        if user_data and user_data.get('referred_by'):
-            return False
+        # Record the referral before crediting it, so a failed write cannot be claimed twice
+        ctx.set(referred_by=referrer_id)
+        if not await ctx.save():
+            return None
         
-        await db.add_points(referrer_id, REFER_POINT)
-        await db.update_user(new_user_id, {'referred_by': referrer_id})
+        points = await db.credit_referral(referrer_id, REFER_POINT)
+        if points is None:
+            return None
         
-        referrer_data = await db.get_user(referrer_id)
-        current_refs = referrer_data.get('total_referrals', 0) if referrer_data else 0
-        await db.update_user(referrer_id, {'total_referrals': current_refs + 1})
-        
-        logger.info(f"✅ Referral: {referrer_id} → {new_user_id} (+{REFER_POINT} points)")
-        return True
+        logger.info(f"✅ Referral: {referrer_id} → {ctx.user_id} (+{REFER_POINT} points)")
+        return points
         
     except Exception as e:
         logger.error(f"Error processing referral: {e}")
-        return False
+        return None
 
 
 @Client.on_message(filters.command("start") & filters.private)
@@ -85,7 +90,14 @@ async def start_command(client, message):
     
     logger.info(f"⭐ /start from user {user_id}")
     
-    await db.add_user(user_id)
+    # Registers a new user and reads their state in one round trip. File links from
+    # premium / verified users skip it: their cached entitlement is all that is needed.
+    cached = entitlements.get(user_id)
+    file_link = len(message.command) > 1 and message.command[1].startswith("file_")
+    if file_link and cached and (cached.is_premium() or cached.is_verified()):
+        ctx = None
+    else:
+        ctx = await load_user_context(user_id)
     
     # Check if it's a deep link
     if len(message.command) > 1:
@@ -94,9 +106,9 @@ async def start_command(client, message):
         # Handle referral link
         if data.startswith("ref"):
             referrer_id = int(data.replace("ref", ""))
-            success = await process_referral(user_id, referrer_id)
+            points = await process_referral(ctx, referrer_id)
             
-            if success:
+            if points is not None:
                 await message.reply(
                     f"🎉 **Welcome Bonus!**\n\n"
                     f"You've been referred by a friend!\n"
@@ -107,8 +119,6 @@ async def start_command(client, message):
                 )
                 
                 try:
-                    referrer_data = await db.get_user(referrer_id)
-                    points = referrer_data.get('points', 0) if referrer_data else 0
                     await client.send_message(
                         referrer_id,
                         f"🎁 **New Referral!**\n\n"
@@ -142,7 +152,7 @@ async def start_command(client, message):
             
             logger.info(f"🔍 Verification attempt by user {user_id}")
             
-            token_valid = await verify_db.verify_token(user_id, token)
+            token_valid = ctx.token_matches(token)
             
             if token_valid:
                 await verify_db.update_verification(user_id)
@@ -172,7 +182,7 @@ async def start_command(client, message):
         # File deep link
         elif data.startswith("file_"):
             file_id = data.split("_", 1)[1]
-            await send_file_by_deeplink(client, message, file_id)
+            await send_file_by_deeplink(client, message, file_id, ctx)
             return
     
     buttons = [
@@ -192,28 +202,34 @@ async def start_command(client, message):
     )
 
 
-async def send_file_by_deeplink(client, message, file_id):
+async def send_file_by_deeplink(client, message, file_id, ctx=None):
     """Send file when accessed via deep link - WITH VERIFICATION AND AUTO-DELETE"""
     user_id = message.from_user.id
+    entitlement = ctx.entitlement if ctx else entitlements.get(user_id)
+    if entitlement is None:
+        ctx = await load_user_context(user_id)
+        entitlement = ctx.entitlement
     
     logger.info(f"📥 File request from user {user_id} for file {file_id}")
     
-    is_premium = await db.is_premium_user(user_id)
+    is_premium = entitlement.is_premium()
     
     if is_premium:
         logger.info(f"👑 Premium user {user_id} - bypassing verification")
     elif user_id not in ADMINS:
-        is_verified = await verify_db.is_verified(user_id)
+        is_verified = entitlement.is_verified()
         
         if not is_verified:
-            user_data = await verify_db.get_user(user_id)
-            files_sent = user_data.get('files_sent', 0) if user_data else 0
+            # Quota needs the user document (already loaded unless the entitlement just expired)
+            ctx = ctx or await load_user_context(user_id)
+            files_sent = ctx.files_sent
             
             if files_sent >= FREE_FILE_LIMIT:
                 logger.info(f"🚫 Access DENIED - showing verification link")
                 
                 token = generate_verify_token()
-                await verify_db.set_verify_token(user_id, f"verify_{token}", 600)
+                ctx.set(verify_token=f"verify_{token}", token_expire=int(time.time()) + 600)
+                await ctx.save()
                 
                 me = await client.get_me()
                 telegram_link = f"https://t.me/{me.username}?start=verify_{token}"
@@ -251,7 +267,8 @@ Click a button below:
                 return
         
         if not is_verified:
-            await verify_db.increment_files_sent(user_id)
+            ctx.inc('files_sent')
+            await ctx.save()
     
     # Get file data
     try:
@@ -268,16 +285,9 @@ Click a button below:
         await message.reply("❌ File not found!")
         return
     
-    # Clean caption
-    original_caption = file_data.get('caption', '')
-    file_name = file_data.get('file_name', 'Unknown File')
+    # Clean caption (stored at ingest)
     file_size = get_size(file_data.get('file_size', 0))
-    
-    display_name = original_caption if original_caption else file_name
-    cleaned_caption = clean_caption(display_name)
-    
-    logger.info(f"📝 Original: {display_name[:80]}")
-    logger.info(f"🧹 Cleaned: {cleaned_caption[:80]}")
+    cleaned_caption = display_name(file_data)
     
     # Build caption
     if is_premium:
@@ -318,6 +328,7 @@ Click a button below:
             )
         
         logger.info(f"✅ File sent successfully to user {user_id}")
+        asyncio.create_task(db.record_download(file_data['_id']))
         
         # Auto-delete for non-premium users
         if AUTO_DELETE and not is_premium:
@@ -348,20 +359,34 @@ async def delete_message_after_delay(message, delay_seconds):
 @Client.on_message(filters.text & filters.group, group=1)
 async def group_search_handler(client, message):
     """Handle movie search in GROUPS with pagination"""
+    # Unconnected groups, replies, links, mentions, emoji and paragraphs are rejected before any DB/API work
+    group_registry.ensure_loading(db.grp)
+    if classify_group_message(message, group_registry if group_registry.ready else None):
+        return
+    settings = group_registry.settings(message.chat.id)
+    
     search = message.text.strip()
     
-    if len(search) < 3 or search.startswith("/"):
-        return
+    # Chatter whose words appear in no title never reaches the database
+    tokens = tokenize(search)
+    if search_index.ready and not search_index.might_match(tokens):
+        if not (SPELL_CHECK and spell_checker.correct_query(tokens)):
+            return
     
     logger.info(f"🔍 GROUP SEARCH from {message.chat.id}: '{search}'")
     
     try:
-        files, total = await db.search_files(search)
+        # Every page, including this first one, is cut from the session's ranked ids
+        session, corrected = await search_with_correction(search)
         
-        if not files or total == 0:
+        if not session:
             logger.info(f"❌ No files found for: {search}")
             return
         
+        if corrected:
+            search = corrected
+        total = session.total
+        
         logger.info(f"✅ Found {total} files")
         
         global bot_username
@@ -369,66 +394,28 @@ async def group_search_handler(client, message):
             me = await client.get_me()
             bot_username = me.username
         
-        # ✅ Pagination - Show first 10 files
-        page = 0
-        per_page = 10
-        start = page * per_page
-        end = start + per_page
-        page_files = files[start:end]
-        
-        file_text = f"📁 Found {total} files for `{search}`\n"
-        file_text += f"📄 Showing {start+1}-{min(end, total)} of {total}\n\n"
-        
-        for file in page_files:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error formatting file: {e}")
-                continue
-        
-        file_text += f"🎬 Join: {YOUR_CHANNEL}"
-        
-        # ✅ Build buttons with pagination
-        buttons = []
-        
-        # Add navigation row if more than 10 files
-        nav_buttons = []
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️ Previous", callback_data=f"page_{page-1}#{search}"))
-        if end < total:
-            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"page_{page+1}#{search}"))
-        
-        if nav_buttons:
-            buttons.append(nav_buttons)
-        
-        # Filter buttons
-        buttons.extend([
-            [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-             InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-            [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-             InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-            [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url=RARE_VIDEOS_LINK)],
-            [InlineKeyboardButton("👑 Get Premium", callback_data="premium"),
-             InlineKeyboardButton("❌ Close", callback_data="close")]
-        ])
+        # Buttons carry only the session token - the query and results stay server-side
+        file_text, markup, _ = await render_results(
+            db, session, 0, settings['page_size'], total, bot_username, corrected=bool(corrected)
+        )
         
-        await message.reply(
+        sent = await message.reply(
             file_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=markup,
             parse_mode=enums.ParseMode.HTML,
             disable_web_page_preview=True
         )
         
         logger.info(f"✅ Search results sent to group {message.chat.id}")
+        prefetch_next_page(db, session, 0, settings['page_size'], total, bot_username)
+        
+        if settings['auto_delete']:
+            asyncio.create_task(delete_message_after_delay(sent, settings['auto_delete_time']))
+        
+        # Warm the facet counts so the filter menus open without a query - only when
+        # they are bitmap ANDs; on the $text path a menu press pays for its own count
+        if search_index.ready:
+            asyncio.create_task(session_facets(db, session))
         
     except Exception as e:
         logger.error(f"❌ Error in group_search: {e}", exc_info=True)
@@ -443,75 +430,38 @@ async def private_search(client, message):
     logger.info(f"🔍 PRIVATE SEARCH: '{search}'")
     
     try:
-        files, total = await db.search_files(search)
+        per_page = group_registry.page_size(message.chat.id)
+        session, corrected = await search_with_correction(search)
         
-        if not files:
+        if not session:
             await message.reply(f"❌ No files found for: {search}")
             return
         
+        if corrected:
+            search = corrected
+        total = session.total
+        
         global bot_username
         if not bot_username:
             me = await client.get_me()
             bot_username = me.username
         
-        # ✅ Pagination - Show first 10 files
-        page = 0
-        per_page = 10
-        start = page * per_page
-        end = start + per_page
-        page_files = files[start:end]
-        
-        file_text = f"📁 Found {total} files for `{search}`\n"
-        file_text += f"📄 Showing {start+1}-{min(end, total)} of {total}\n\n"
-        
-        for file in page_files:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error: {e}")
-        
-        file_text += f"🎬 Join: {YOUR_CHANNEL}"
-        
-        # ✅ Build buttons with pagination
-        buttons = []
-        
-        # Add navigation row if more than 10 files
-        nav_buttons = []
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️ Previous", callback_data=f"page_{page-1}#{search}"))
-        if end < total:
-            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"page_{page+1}#{search}"))
-        
-        if nav_buttons:
-            buttons.append(nav_buttons)
-        
-        # Filter buttons
-        buttons.extend([
-            [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-             InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-            [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-             InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-            [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url=RARE_VIDEOS_LINK)],
-            [InlineKeyboardButton("👑 Get Premium", callback_data="premium"),
-             InlineKeyboardButton("❌ Close", callback_data="close")]
-        ])
+        # Buttons carry only the session token - the query and results stay server-side
+        file_text, markup, _ = await render_results(
+            db, session, 0, per_page, total, bot_username, corrected=bool(corrected)
+        )
         
         await message.reply(
             file_text, 
-            reply_markup=InlineKeyboardMarkup(buttons), 
+            reply_markup=markup, 
             parse_mode=enums.ParseMode.HTML, 
             disable_web_page_preview=True
         )
         
+        prefetch_next_page(db, session, 0, per_page, total, bot_username)
+        if search_index.ready:
+            asyncio.create_task(session_facets(db, session))
+        
     except Exception as e:
         logger.error(f"❌ Error in private_search: {e}", exc_info=True)
 
@@ -521,76 +471,34 @@ async def private_search(client, message):
 async def pagination_handler(client, query):
     """Handle pagination - next/previous pages"""
     try:
-        data = query.data.split("#")
-        page_data = data[0]
-        search = data[1]
-        
-        page = int(page_data.replace("page_", ""))
+        session = await callback_session(db, query)
+        if not session:
+            return
+        page = int(query.data.split("#")[0].replace("page_", ""))
         
-        # Search files again
-        files, total = await db.search_files(search)
+        # Page through the session's cached results - one _id range read per page
+        await load_results(db, session)
+        total = session.total
         
         global bot_username
         if not bot_username:
             me = await client.get_me()
             bot_username = me.username
         
-        # Paginate
-        per_page = 10
-        start = page * per_page
-        end = start + per_page
-        page_files = files[start:end]
-        
-        file_text = f"📁 Found {total} files for `{search}`\n"
-        file_text += f"📄 Showing {start+1}-{min(end, total)} of {total}\n\n"
-        
-        for file in page_files:
-            try:
-                file_id = str(file.get('_id', ''))
-                original_caption = file.get('caption', '')
-                file_name = file.get('file_name', 'Unknown')
-                display_name = original_caption if original_caption else file_name
-                cleaned_name = clean_caption(display_name)
-                file_size = get_size(file.get('file_size', 0))
-                
-                deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
-                clickable_text = f'<a href="{deep_link}">📁 {file_size} ▷ {cleaned_name}</a>'
-                file_text += f"{clickable_text}\n\n"
-            except Exception as e:
-                logger.error(f"Error: {e}")
-        
-        file_text += f"🎬 Join: {YOUR_CHANNEL}"
-        
-        # Build buttons
-        buttons = []
-        
-        nav_buttons = []
-        if page > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️ Previous", callback_data=f"page_{page-1}#{search}"))
-        if end < total:
-            nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"page_{page+1}#{search}"))
-        
-        if nav_buttons:
-            buttons.append(nav_buttons)
-        
-        buttons.extend([
-            [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{search}"),
-             InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{search}")],
-            [InlineKeyboardButton("📺 Season", callback_data=f"season#{search}"),
-             InlineKeyboardButton("📋 Episode", callback_data=f"episode#{search}")],
-            [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url=RARE_VIDEOS_LINK)],
-            [InlineKeyboardButton("👑 Get Premium", callback_data="premium"),
-             InlineKeyboardButton("❌ Close", callback_data="close")]
-        ])
+        per_page = group_registry.page_size(query.message.chat.id)
+        file_text, markup, page = await render_results(db, session, page, per_page, total, bot_username)
+        record_page_view(session, page)
+        set_page(db, session, page)
         
         await query.message.edit_text(
             file_text,
-            reply_markup=InlineKeyboardMarkup(buttons),
+            reply_markup=markup,
             parse_mode=enums.ParseMode.HTML,
             disable_web_page_preview=True
         )
         
         await query.answer(f"📄 Page {page+1}")
+        prefetch_next_page(db, session, page, per_page, total, bot_username)
         
     except Exception as e:
         logger.error(f"Pagination error: {e}")
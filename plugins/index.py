@@ -2,6 +2,8 @@ from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from database.database import Database
 from info import ADMINS, CHANNELS
+from utils.file_detector import extract_media_metadata
+from utils.caption_cleaner import make_display_name
 import asyncio
 
 db = Database()
@@ -39,6 +41,8 @@ async def index_files_command(client, message):
                     'channel_id': channel_id,
                     'message_id': msg.id
                 }
+                file_data.update(extract_media_metadata(file_data['file_name'], file_data['caption']))
+                file_data['display_name'] = make_display_name(file_data['file_name'], file_data['caption'])
                 
                 try:
                     await db.add_file(file_data)
@@ -66,6 +70,15 @@ async def index_files_command(client, message):
         await message.reply(f"Error: {e}")
 
 
+@Client.on_message(filters.command("backfill") & filters.user(ADMINS))
+async def backfill_metadata_command(client, message):
+    """Extract language/quality/season/episode/year for files indexed before metadata existed"""
+    
+    status = await message.reply("Extracting metadata for old files...")
+    updated = await db.backfill_media_metadata()
+    await status.edit(f"✅ <b>Metadata Backfill Completed!</b>\n\n📁 <b>Updated:</b> {updated}")
+
+
 @Client.on_message(filters.command("total") & filters.user(ADMINS))
 async def total_files_command(client, message):
     """Show total indexed files"""
@@ -0,0 +1,88 @@
+from pyrogram import Client, enums
+from pyrogram.types import (
+    InlineQueryResultArticle, InputTextMessageContent,
+    InlineKeyboardMarkup, InlineKeyboardButton
+)
+from database.database import Database
+from database.search_index import search_index, normalize_query
+from info import INLINE_CACHE_TIME, INLINE_DEBOUNCE
+from utils.file_properties import get_size
+import asyncio
+import html
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+db = Database()
+
+RESULTS_PER_PAGE = 50  # Telegram's maximum per answer
+
+# user_id -> time of that user's latest inline query (debounce)
+latest_inline_query = {}
+
+bot_username = None
+
+
+@Client.on_inline_query()
+async def inline_search(client, query):
+    """As-you-type search served from the title prefix index"""
+    global bot_username
+
+    text = normalize_query(query.query)
+    if len(text) < 2:
+        await query.answer([], cache_time=INLINE_CACHE_TIME, switch_pm_text="🔍 Type a movie name", switch_pm_parameter="start")
+        return
+
+    offset = int(query.offset or 0)
+
+    # Wait for the user to stop typing; a newer keystroke supersedes this query
+    if offset == 0:
+        stamp = time.monotonic()
+        latest_inline_query[query.from_user.id] = stamp
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if latest_inline_query.get(query.from_user.id) != stamp:
+            return
+        latest_inline_query.pop(query.from_user.id, None)
+
+    try:
+        if search_index.ready:
+            files, has_more = search_index.search_titles(text, offset, RESULTS_PER_PAGE)
+        else:
+            files, total = await db.search_files(text, offset, RESULTS_PER_PAGE)
+            has_more = offset + len(files) < total
+
+        if not bot_username:
+            me = await client.get_me()
+            bot_username = me.username
+
+        results = []
+        for file in files:
+            file_id = str(file['_id'])
+            file_name = file.get('file_name', 'Unknown')
+            file_size = get_size(file.get('file_size', 0))
+            deep_link = f"https://t.me/{bot_username}?start=file_{file_id}"
+
+            results.append(InlineQueryResultArticle(
+                id=file_id,
+                title=f"📁 {file_name}",
+                description=f"📦 {file_size}",
+                input_message_content=InputTextMessageContent(
+                    f'<a href="{deep_link}">📁 {file_size} ▷ {html.escape(file_name)}</a>',
+                    parse_mode=enums.ParseMode.HTML,
+                    disable_web_page_preview=True
+                ),
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("📥 Get File", url=deep_link)]])
+            ))
+
+        await query.answer(
+            results,
+            cache_time=INLINE_CACHE_TIME,
+            next_offset=str(offset + len(files)) if has_more else "",
+            is_personal=False
+        )
+
+    except Exception as e:
+        logger.error(f"❌ Inline search error: {e}")
+
+
+logger.info("✅ INLINE SEARCH LOADED")
@@ -1,15 +1,19 @@
 from pyrogram import Client, filters
-from info import CHANNELS, DELETE_CHANNELS, DATABASE_URI, DATABASE_NAME
+from pymongo.errors import DuplicateKeyError
+from info import CHANNELS, DELETE_CHANNELS
 import logging
 import re
-from motor.motor_asyncio import AsyncIOMotorClient
+from database.client import get_database
+from database.database import invalidate_search_cache
+from database.search_index import search_index
+from utils.file_detector import extract_media_metadata
+from utils.caption_cleaner import make_display_name
 
 logger = logging.getLogger(__name__)
 
-# Initialize MongoDB directly
+# Shared MongoDB client
 try:
-    mongo_client = AsyncIOMotorClient(DATABASE_URI)
-    db = mongo_client[DATABASE_NAME]
+    db = get_database()
     files_collection = db.files
 except Exception as e:
     logger.error(f"Database connection error: {e}")
@@ -85,7 +89,7 @@ async def save_files(client, message):
         mime_type = getattr(media, 'mime_type', 'unknown')  # ✅ ADDED: MIME type for better handling
         
         # Check if file already exists in database (avoid duplicates)
-        existing = await files_collection.find_one({'file_id': file_id})
+        existing = await files_collection.find_one({'file_id': file_id}, {'_id': 1})
         if existing:
             logger.info(f"⚠️ File already in database: {file_name[:30]}...")
             return
@@ -103,13 +107,20 @@ async def save_files(client, message):
             'chat_id': message.chat.id,
             'message_id': message.id
         }
+        file_document.update(extract_media_metadata(file_name, message.caption))
+        file_document['display_name'] = make_display_name(file_name, message.caption)
         
         # Insert directly into MongoDB
         result = await files_collection.insert_one(file_document)
         
         if result.inserted_id:
+            search_index.add({**file_document, '_id': result.inserted_id})
+            invalidate_search_cache()
             logger.info(f"✅ Auto-saved: {file_name[:50]} (ID: {file_id[:20]}...)")
             
+    except DuplicateKeyError:
+        # Saved meanwhile by another update, or rejected by a unique index
+        logger.info(f"⚠️ File already in database: {file_name[:30]}...")
     except Exception as e:
         logger.error(f"❌ Error saving file: {e}")
         
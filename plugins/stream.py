@@ -37,7 +37,10 @@ async def handle_stream_file(client, query: CallbackQuery):
         file_id = query.data.split(":", 1)[1]
         logger.info(f"Stream request for file: {file_id}")
         
-        file_data = await db.get_file(ObjectId(file_id) if len(file_id) == 24 else file_id)
+        file_data = await db.get_file(
+            ObjectId(file_id) if len(file_id) == 24 else file_id,
+            {'file_name': 1, 'file_size': 1, 'file_link': 1, 'caption': 1}
+        )
         if not file_data:
             await query.answer("❌ File not found!", show_alert=True)
             return
@@ -0,0 +1,135 @@
+"""
+Hot-path reads must name the fields they fetch.
+
+The repositories run against a collection double that fails any find /
+find_one / find_one_and_update without a projection and records aggregation
+pipelines, so a read that pulls whole documents fails here.
+"""
+
+import asyncio
+import pytest
+from database import database as database_module
+from database.database import Database, FILE_LIST_PROJECTION
+from database.entitlements import entitlements
+from database.search_index import search_index
+from database.users import UserDB
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    skip = limit = sort
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class StrictCollection:
+    """Collection double rejecting unprojected reads"""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.pipelines = []
+        self.projections = []
+
+    def _projected(self, projection):
+        assert projection, "hot-path read without a projection"
+        self.projections.append(projection)
+
+    def find(self, filter=None, projection=None, **kwargs):
+        self._projected(projection)
+        return Cursor(self.docs)
+
+    async def find_one(self, filter=None, projection=None, **kwargs):
+        self._projected(projection)
+        return self.docs[0] if self.docs else None
+
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        self._projected(projection)
+        return self.docs[0] if self.docs else None
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return Cursor([{'files': self.docs, 'total': [{'n': len(self.docs)}]}])
+
+    async def count_documents(self, filter):
+        return len(self.docs)
+
+
+FILES = [{'_id': 1, 'display_name': 'Leo 2023', 'file_name': 'Leo.2023.mkv', 'file_size': 10}]
+USERS = [{'user_id': 7, 'points': 3, 'premium_expire': 0}]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Force the Mongo $text path and start from empty caches
+    monkeypatch.setattr(search_index, 'ensure_loading', lambda collection: None)
+    monkeypatch.setattr(search_index, 'ready', False)
+    database_module.invalidate_search_cache()
+    entitlements.invalidate(7)
+    return Database(db={
+        'files': StrictCollection(FILES), 'groups': StrictCollection(),
+        'users': StrictCollection(USERS), 'search_sessions': StrictCollection()
+    })
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize('mode', ['facet', 'capped'])
+def test_text_search_projects_listing(db, mode):
+    run(db._search_text('leo', 0, 10, mode=mode))
+    files_branch = db.col.pipelines[-1][-1]['$facet']['files']
+    assert files_branch[-1] == {'$project': FILE_LIST_PROJECTION}
+
+
+def test_exact_text_search_projects_listing(db):
+    run(db._search_text('leo', 0, 10, mode='exact'))
+    assert FILE_LIST_PROJECTION.items() <= db.col.projections[-1].items()
+
+
+def test_search_ids_project_only_ids(db):
+    run(db.search_file_ids('leo'))
+    assert db.col.pipelines[-1][-1] == {'$project': {'_id': 1}}
+
+
+def test_listing_model_is_lean(db):
+    files = run(db.get_files_by_ids([1]))
+    assert db.col.projections == [FILE_LIST_PROJECTION]
+    assert 'caption' not in FILE_LIST_PROJECTION
+    assert files == FILES
+
+
+def test_caption_read_only_without_display_name(db):
+    db.col.docs = [{'_id': 2, 'file_name': 'old.mkv', 'file_size': 1}]
+    run(db.get_files_by_ids([2]))
+    assert db.col.projections == [FILE_LIST_PROJECTION, {'caption': 1}]
+
+
+def test_file_delivery_is_projected(db):
+    run(db.get_file(1))
+    run(db.get_file_by_file_id('abc'))
+
+
+def test_user_reads_are_projected(db):
+    run(db.get_user(7))
+    run(db.is_premium_user(7))
+    run(db.get_points(7))
+    run(db.get_referral_count(7))
+
+
+def test_user_db_reads_are_projected():
+    users = UserDB(db={'users': StrictCollection(USERS)})
+    run(users.get_user(7))
+    run(users.is_premium(7))
+    run(users.get_points(7))
+    run(users.get_all_users())
@@ -0,0 +1,75 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Ordinals per chunk: a set bit copies at most CHUNK_BITS / 8 bytes
+CHUNK_BITS = 1024
+
+
+class Bitmap:
+    """
+    Sparse bitset over file ordinals: {chunk number: int of CHUNK_BITS bits},
+    only chunks holding a set bit exist. Rare values stay small, nothing is
+    converted per query, and AND / popcount run per chunk on Python ints.
+    """
+
+    __slots__ = ('_chunks',)
+
+    def __init__(self, chunks=None):
+        self._chunks = chunks if chunks is not None else {}
+
+    @classmethod
+    def from_ordinals(cls, ordinals):
+        """Build in one pass - bits go into per-chunk bytearrays, converted once"""
+        buffers = {}
+        for ordinal in ordinals:
+            chunk, bit = divmod(ordinal, CHUNK_BITS)
+            buffer = buffers.get(chunk)
+            if buffer is None:
+                buffer = buffers[chunk] = bytearray(CHUNK_BITS // 8)
+            buffer[bit >> 3] |= 1 << (bit & 7)
+        return cls({chunk: int.from_bytes(buffer, 'little') for chunk, buffer in buffers.items()})
+
+    def add(self, ordinal):
+        chunk, bit = divmod(ordinal, CHUNK_BITS)
+        self._chunks[chunk] = self._chunks.get(chunk, 0) | (1 << bit)
+
+    def discard(self, ordinal):
+        chunk, bit = divmod(ordinal, CHUNK_BITS)
+        value = self._chunks.get(chunk)
+        if value is None:
+            return
+        value &= ~(1 << bit)
+        if value:
+            self._chunks[chunk] = value
+        else:
+            del self._chunks[chunk]
+
+    def __contains__(self, ordinal):
+        if ordinal < 0:
+            return False
+        chunk, bit = divmod(ordinal, CHUNK_BITS)
+        return bool(self._chunks.get(chunk, 0) >> bit & 1)
+
+    def __len__(self):
+        return sum(value.bit_count() for value in self._chunks.values())
+
+    def __bool__(self):
+        return bool(self._chunks)
+
+    def __and__(self, other):
+        small, large = sorted((self._chunks, other._chunks), key=len)
+        chunks = {}
+        for chunk, value in small.items():
+            value &= large.get(chunk, 0)
+            if value:
+                chunks[chunk] = value
+        return Bitmap(chunks)
+
+    def intersection_count(self, other):
+        """len(self & other) without building the intersection"""
+        small, large = sorted((self._chunks, other._chunks), key=len)
+        return sum((value & large.get(chunk, 0)).bit_count() for chunk, value in small.items())
+
+    def nbytes(self):
+        return sum((value.bit_length() + 7) // 8 for value in self._chunks.values())
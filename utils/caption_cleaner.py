@@ -0,0 +1,39 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+SPAM_WORDS = [
+    'join', 'subscribe', 'channel', 'group', 'follow',
+    'movie', 'download', 'here', 'now', 'free', 'latest'
+]
+SPAM_EMOJI = ['👉', '⚡', '🎬', '📢', '▶️', '🔥', '✅']
+
+# Links, mentions, spam words and promo emoji in one alternation - one scan per caption
+CLEAN_RE = re.compile(
+    r'(?:https?://)?(?:t\.me|telegram\.me)/\S+'
+    r'|@\w+'
+    r'|\b(?:' + '|'.join(map(re.escape, SPAM_WORDS)) + r')\b'
+    r'|' + '|'.join(map(re.escape, SPAM_EMOJI)),
+    re.IGNORECASE
+)
+WHITESPACE_RE = re.compile(r'\s+')
+STRIP_CHARS = ' .-_|•~'
+
+
+def clean_caption(caption):
+    """Remove other channel links, mentions and promo words from caption"""
+    if not caption:
+        return caption
+    caption = CLEAN_RE.sub('', caption)
+    return WHITESPACE_RE.sub(' ', caption).strip(STRIP_CHARS)
+
+
+def make_display_name(file_name, caption=''):
+    """Name shown in result lists - computed once at ingest and stored as `display_name`"""
+    return clean_caption(caption or file_name) or file_name or 'Unknown'
+
+
+def display_name(file):
+    """Stored display name of a file document, computed for files saved before it existed"""
+    return file.get('display_name') or make_display_name(file.get('file_name', ''), file.get('caption', ''))
@@ -1,72 +1,136 @@
 import re
 import logging
+from database.search_index import tokenize
+from utils.keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
 # Store user filter preferences temporarily (in-memory)
 user_filters = {}
 
+# Language keywords for filtering (matched as whole tokens/phrases)
+LANGUAGE_KEYWORDS = {
+    'Tamil': ['tamil', 'tam', '.tam.', '[tam]', 'தமிழ்', 'tmv', 'tn'],
+    'Telugu': ['telugu', 'tel', '.tel.', '[tel]', 'తెలుగు', 'tlu'],
+    'Hindi': ['hindi', 'hin', '.hin.', '[hin]', 'हिन्दी', 'hnd'],
+    'Malayalam': ['malayalam', 'mal', '.mal.', '[mal]', 'മലയാളം', 'mlm'],
+    'Kannada': ['kannada', 'kan', '.kan.', '[kan]', 'ಕನ್ನಡ', 'knd'],
+    'English': ['english', 'eng', '.eng.', '[eng]', 'dual audio']
+}
+
+# Quality keywords - checked in order, best quality first
+QUALITY_KEYWORDS = {
+    '2160p': ['2160p', '4k', 'uhd', '2160'],
+    '1080p': ['1080p', 'fhd', 'fullhd', '1080'],
+    '720p': ['720p', 'hd', '720'],
+    '480p': ['480p', 'sd', '480'],
+    '360p': ['360p', '360']
+}
+
+SEASON_EPISODE_RE = re.compile(r'\bs0*(\d{1,2}) ?ep?0*(\d{1,3})\b')
+SEASON_RE = re.compile(r'\b(?:s|season ?)0*(\d{1,2})\b')
+EPISODE_RE = re.compile(r'\b(?:e|ep ?|episode ?)0*(\d{1,3})\b')
+YEAR_RE = re.compile(r'\b(19[3-9]\d|20[0-4]\d)\b')
+
+
+def _build_matcher():
+    """One automaton for every language and quality term ('.tam.' / '[tam]' -> 'tam')"""
+    matcher = KeywordMatcher()
+    for field, keyword_map in (('language', LANGUAGE_KEYWORDS), ('quality', QUALITY_KEYWORDS)):
+        for name, keywords in keyword_map.items():
+            for keyword in keywords:
+                term = ' '.join(tokenize(keyword))
+                if term:
+                    matcher.add(term, (field, name))
+    matcher.build()
+    return matcher
+
+
+_KEYWORD_MATCHER = _build_matcher()
+
+
+def extract_media_metadata(file_name, caption=''):
+    """
+    Extract normalized languages/quality/season/episode/year from a file name and caption.
+    Runs once at ingest; the result is stored on the file document and queried by index.
+    """
+    text = ' '.join(tokenize(f"{file_name or ''} {caption or ''}"))
+    return _metadata_from_text(text, _KEYWORD_MATCHER.match(text))
+
+
+def extract_media_metadata_many(items):
+    """Batch form of extract_media_metadata for [(file_name, caption), ...] - used by backfills"""
+    texts = [' '.join(tokenize(f"{file_name or ''} {caption or ''}")) for file_name, caption in items]
+    return [
+        _metadata_from_text(text, labels)
+        for text, labels in zip(texts, _KEYWORD_MATCHER.match_many(texts))
+    ]
+
+
+def _metadata_from_text(text, labels):
+    languages = [name for name in LANGUAGE_KEYWORDS if ('language', name) in labels]
+    # Best quality first
+    quality = next((name for name in QUALITY_KEYWORDS if ('quality', name) in labels), None)
+
+    season = episode = None
+    match = SEASON_EPISODE_RE.search(text)
+    if match:
+        season, episode = int(match.group(1)), int(match.group(2))
+    else:
+        match = SEASON_RE.search(text)
+        if match:
+            season = int(match.group(1))
+        match = EPISODE_RE.search(text)
+        if match:
+            episode = int(match.group(1))
+
+    match = YEAR_RE.search(text)
+    year = int(match.group(1)) if match else None
+
+    return {
+        'languages': languages,
+        'quality': quality,
+        'season': season,
+        'episode': episode,
+        'year': year
+    }
+
+
+def metadata_filter(filters):
+    """Turn {'language': 'Tamil', 'season': '2', ...} into a Mongo predicate on the stored fields"""
+    query = {}
+    if not filters:
+        return query
+
+    language = filters.get('language')
+    if language and language != 'All':
+        query['languages'] = language
+
+    quality = filters.get('quality')
+    if quality and quality != 'All':
+        query['quality'] = quality
+
+    for field in ('season', 'episode'):
+        value = filters.get(field)
+        if value and value != 'All':
+            query[field] = int(value)
+
+    return query
+
 
 def detect_file_languages(filename):
     """Detect ALL languages present in filename (multi-language support)"""
-    filename_lower = filename.lower()
-    
-    languages = []
-    
-    # Check for each language (short form + full form)
-    if any(x in filename_lower for x in ['tam', 'tamil']):
-        languages.append('Tamil')
-    
-    if any(x in filename_lower for x in ['tel', 'telugu']):
-        languages.append('Telugu')
-    
-    if any(x in filename_lower for x in ['hin', 'hindi']):
-        languages.append('Hindi')
-    
-    if any(x in filename_lower for x in ['mal', 'malayalam']):
-        languages.append('Malayalam')
-    
-    if any(x in filename_lower for x in ['kan', 'kannada']):
-        languages.append('Kannada')
-    
-    if any(x in filename_lower for x in ['eng', 'english']):
-        languages.append('English')
-    
-    return languages
+    return extract_media_metadata(filename)['languages']
 
 
 def detect_file_info(filename):
     """Detect languages, quality, and season from filename"""
-    filename_lower = filename.lower()
-    
-    logger.info(f"Detecting info for: {filename}")
-    
-    # Detect ALL languages in the file
-    languages = detect_file_languages(filename)
-    
-    # Detect Quality
-    quality = None
-    if '2160p' in filename_lower or '4k' in filename_lower:
-        quality = '2160p'
-    elif '1080p' in filename_lower:
-        quality = '1080p'
-    elif '720p' in filename_lower:
-        quality = '720p'
-    elif '480p' in filename_lower:
-        quality = '480p'
-    elif '360p' in filename_lower:
-        quality = '360p'
-    
-    # Detect Season
-    season = None
-    season_match = re.search(r'[Ss]0*(\d+)', filename)
-    if season_match:
-        season_num = season_match.group(1)
-        season = f"S{season_num}"
+    metadata = extract_media_metadata(filename)
+    season = f"S{metadata['season']}" if metadata['season'] else None
     
-    logger.info(f"Detected -> Languages: {languages}, Quality: {quality}, Season: {season}")
+    logger.info(f"Detected -> Languages: {metadata['languages']}, Quality: {metadata['quality']}, Season: {season}")
     
-    return languages, quality, season
+    return metadata['languages'], metadata['quality'], season
 
 
 def filter_files_by_preference(files, user_id):
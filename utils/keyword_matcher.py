@@ -0,0 +1,73 @@
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over space-separated tokens. Every term is stored
+    padded with spaces, so "tam" matches the token "tam" but not "hamtam",
+    and multi-word terms ("dual audio") match whole-token phrases. One pass
+    over the text finds the labels of every term it contains.
+    """
+
+    def __init__(self):
+        self._goto = [{}]     # node -> {char: node}
+        self._fail = [0]      # node -> longest proper suffix that is also a prefix
+        self._out = [()]      # node -> labels of the terms ending here
+        self._built = False
+
+    def add(self, term, label):
+        """Add a normalized term (tokens joined by single spaces)"""
+        node = 0
+        for char in f' {term} ':
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = child
+        if label not in self._out[node]:
+            self._out[node] += (label,)
+        self._built = False
+
+    def build(self):
+        """Compute failure links (breadth first) and merge outputs along them"""
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        for child in queue:
+            fail[child] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                if fail[child] == child:
+                    fail[child] = 0
+                out[child] += tuple(label for label in out[fail[child]] if label not in out[child])
+        self._built = True
+
+    def match(self, text):
+        """Labels of every term found in a normalized text (tokens joined by single spaces)"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for char in f' {text} ':
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    def match_many(self, texts):
+        """Batch form of match() for backfills"""
+        return [self.match(text) for text in texts]
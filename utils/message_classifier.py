@@ -0,0 +1,64 @@
+import re
+import logging
+from collections import Counter
+from pyrogram import enums
+from database.search_index import tokenize
+from info import GROUP_SEARCH_MIN_CHARS, GROUP_SEARCH_MAX_CHARS, GROUP_SEARCH_MAX_WORDS
+
+logger = logging.getLogger(__name__)
+
+URL_RE = re.compile(r'https?://|www\.|t\.me/', re.IGNORECASE)
+MENTION_RE = re.compile(r'(?<!\w)@\w{4,}')
+
+LINK_ENTITIES = (enums.MessageEntityType.URL, enums.MessageEntityType.TEXT_LINK)
+MENTION_ENTITIES = (enums.MessageEntityType.MENTION, enums.MessageEntityType.TEXT_MENTION)
+
+# reason -> number of group messages rejected for it ('accepted' counts the rest)
+classifier_stats = Counter()
+
+
+def _reject_reason(message, connected_groups):
+    text = message.text or ''
+
+    if text.startswith('/'):
+        return 'command'
+    if connected_groups is not None and message.chat.id not in connected_groups:
+        return 'not_connected'
+    if message.via_bot:
+        return 'via_bot'
+    if message.reply_to_message:
+        return 'reply'
+
+    length = len(text.strip())
+    if length < GROUP_SEARCH_MIN_CHARS:
+        return 'too_short'
+    if length > GROUP_SEARCH_MAX_CHARS:
+        return 'too_long'
+
+    for entity in message.entities or ():
+        if entity.type in LINK_ENTITIES:
+            return 'link'
+        if entity.type in MENTION_ENTITIES:
+            return 'mention'
+    if URL_RE.search(text):
+        return 'link'
+    if MENTION_RE.search(text):
+        return 'mention'
+
+    tokens = tokenize(text)
+    if not tokens:
+        return 'no_words'
+    if len(tokens) > GROUP_SEARCH_MAX_WORDS:
+        return 'too_many_words'
+
+    return None
+
+
+def classify_group_message(message, connected_groups=None):
+    """
+    Cheap pre-check for group texts. Returns the reason the message is not a
+    search (and counts it), or None if it should be searched.
+    """
+    reason = _reject_reason(message, connected_groups)
+    classifier_stats[reason or 'accepted'] += 1
+    return reason
@@ -0,0 +1,24 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def line_cost(text):
+    """(Telegram characters, UTF-8 bytes) - Telegram counts UTF-16 code units, so emoji count twice"""
+    return len(text.encode('utf-16-le')) // 2, len(text.encode('utf-8'))
+
+
+def pack_lines(costs, char_budget, byte_budget, max_lines):
+    """
+    Number of leading lines (given their precomputed costs) that fit both
+    budgets, capped at max_lines. Always at least one, so a page never stalls.
+    """
+    chars = nbytes = 0
+    count = 0
+    for line_chars, line_bytes in costs[:max_lines]:
+        chars += line_chars
+        nbytes += line_bytes
+        if count and (chars > char_budget or nbytes > byte_budget):
+            break
+        count += 1
+    return count
@@ -0,0 +1,97 @@
+"""
+Speculative next-page prefetch.
+
+Most users press Next within seconds of a page appearing, so once a page is
+shown the following one is packed and rendered in the background into the
+renderer's page cache. Prefetches share a global concurrency limit, are
+dropped once their search session has expired, and never run a search: they
+only read the next window of the session's ids.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from info import PREFETCH_NEXT_PAGE, PREFETCH_CONCURRENCY, SEARCH_SESSION_SIZE, SEARCH_SESSION_TTL
+from utils.cache import TTLCache
+from utils.result_renderer import render_page_body
+from utils.search_session import search_sessions
+
+logger = logging.getLogger(__name__)
+
+prefetch_semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+# scheduled / completed / failed / cancelled / expired / hits / misses
+prefetch_stats = Counter()
+
+# (session token, page) of prefetched pages not viewed yet
+_prefetched = TTLCache(maxsize=SEARCH_SESSION_SIZE, ttl=SEARCH_SESSION_TTL)
+
+# session token -> running prefetch task
+_tasks = {}
+
+
+def prefetch_next_page(db, session, page, per_page, total, bot_username):
+    """Render page + 1 of session in the background (replacing any older prefetch of that session)"""
+    if not PREFETCH_NEXT_PAGE:
+        return
+    _, end = session.page_bounds(page)
+    if end is None or end >= total or not session.loaded:
+        return
+
+    cancel_prefetch(session.token)
+    task = asyncio.create_task(_prefetch(db, session, page + 1, per_page, bot_username))
+    _tasks[session.token] = task
+    prefetch_stats['scheduled'] += 1
+
+    def _forget(_):
+        if _tasks.get(session.token) is task:
+            del _tasks[session.token]
+
+    task.add_done_callback(_forget)
+
+
+async def _prefetch(db, session, page, per_page, bot_username):
+    try:
+        async with prefetch_semaphore:
+            # The session may expire while waiting for a slot or for its files -
+            # nothing is packed or cached for a session nobody can page any more
+            if session.token not in search_sessions:
+                prefetch_stats['expired'] += 1
+                return
+            files = None
+            if session.page_bounds(page)[1] is None:
+                files = await db.get_files_by_ids(session.page_ids(page, per_page))
+                if session.token not in search_sessions:
+                    prefetch_stats['expired'] += 1
+                    return
+            await render_page_body(db, session, page, per_page, bot_username, files)
+            _prefetched.set((session.token, page), True)
+            prefetch_stats['completed'] += 1
+    except Exception as e:
+        prefetch_stats['failed'] += 1
+        logger.error(f"Prefetch error: {e}")
+
+
+def cancel_prefetch(token):
+    """Stop a session's pending prefetch (superseded, or the session expired)"""
+    task = _tasks.pop(token, None)
+    if task is not None and not task.done():
+        task.cancel()
+        prefetch_stats['cancelled'] += 1
+
+
+def record_page_view(session, page):
+    """Count whether a requested page had been prefetched"""
+    if _prefetched.pop((session.token, page)):
+        prefetch_stats['hits'] += 1
+    else:
+        prefetch_stats['misses'] += 1
+
+
+def stats():
+    """Prefetch counters for /stats"""
+    views = prefetch_stats['hits'] + prefetch_stats['misses']
+    return {
+        **prefetch_stats,
+        'hit_rate': round(prefetch_stats['hits'] / views, 3) if views else 0.0
+    }
@@ -0,0 +1,65 @@
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    """
+    Sorted array of (normalized title, ordinal) answering prefix lookups with bisect.
+    A bulk load appends with sort=False and calls sort() once at the end - insort
+    per title would make the load quadratic.
+    """
+
+    def __init__(self):
+        self._keys = []       # sorted [(key, ordinal)], unsorted during a bulk load
+        self._entries = {}    # ordinal -> (key, payload)
+        self._sorted = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, ordinal, key, payload, sort=True):
+        if not key or ordinal in self._entries:
+            return
+        self._entries[ordinal] = (key, payload)
+        if sort and self._sorted:
+            bisect.insort(self._keys, (key, ordinal))
+        else:
+            self._keys.append((key, ordinal))
+            self._sorted = False
+
+    def sort(self):
+        """Finish a bulk load: sort once, dropping titles removed meanwhile"""
+        if self._sorted:
+            return
+        entries = self._entries
+        self._keys = sorted(item for item in self._keys if item[1] in entries)
+        self._sorted = True
+
+    def remove(self, ordinal):
+        entry = self._entries.pop(ordinal, None)
+        if entry is None or not self._sorted:
+            return  # sort() drops it
+        item = (entry[0], ordinal)
+        i = bisect.bisect_left(self._keys, item)
+        if i < len(self._keys) and self._keys[i] == item:
+            del self._keys[i]
+
+    def clear(self):
+        self._keys.clear()
+        self._entries.clear()
+        self._sorted = True
+
+    def search(self, prefix, offset=0, limit=50):
+        """Return (payloads of titles starting with prefix, has_more)"""
+        self.sort()
+        keys = self._keys
+        i = bisect.bisect_left(keys, (prefix,)) + offset
+        results = []
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            if len(results) == limit:
+                return results, True
+            results.append(self._entries[keys[i][1]][1])
+            i += 1
+        return results, False
@@ -0,0 +1,160 @@
+"""
+One renderer for every search-result message.
+
+Pages are packed to fit Telegram's message limit: each takes up to the page
+size of results, fewer when long names would overflow, and the session keeps
+where every page ends. The file list of a page is rendered once per (results
+version, ids on the page) and reused by every message showing it;
+keyboards are built once per (session, page). Rendering a popular page is a
+dict lookup plus a short header.
+"""
+
+import html
+import logging
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from database.database import format_total
+from info import (
+    SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_SESSION_SIZE, SEARCH_SESSION_TTL,
+    RESULT_PAGE_MAX_CHARS, RESULT_PAGE_MAX_BYTES
+)
+from utils.cache import TTLCache
+from utils.caption_cleaner import display_name
+from utils.file_properties import get_size
+from utils.page_packer import line_cost, pack_lines
+
+logger = logging.getLogger(__name__)
+
+# Your channel info
+YOUR_CHANNEL = "@movies_magic_club3"
+YOUR_CHANNEL_LINK = "https://t.me/movies_magic_club3"
+RARE_VIDEOS_LINK = "https://t.me/REAL_TERABOX_PRO_bot"
+
+FILE_LINE = '<a href="https://t.me/{bot}?start=file_{file_id}">📁 {size} ▷ {name}</a>\n\n'
+FOOTER = f"🎬 Join: {YOUR_CHANNEL}"
+
+# Room for the header lines besides the query itself
+HEADER_RESERVE = 256
+
+# (results version, bot, ids on the page) -> rendered file lines
+page_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+# (session token, page, has_next) -> InlineKeyboardMarkup
+keyboard_cache = TTLCache(maxsize=SEARCH_SESSION_SIZE, ttl=SEARCH_SESSION_TTL)
+
+
+def render_file_line(file, bot_username):
+    return FILE_LINE.format(
+        bot=bot_username,
+        file_id=file.get('_id', ''),
+        size=get_size(file.get('file_size', 0)),
+        name=html.escape(display_name(file))
+    )
+
+
+def page_budget(session):
+    """(chars, bytes) left for file lines - fixed per session, so stored page boundaries stay valid"""
+    query_chars, query_bytes = line_cost(html.escape(session.query))
+    footer_chars, footer_bytes = line_cost(FOOTER)
+    # The query is shown up to twice (corrected + found lines)
+    return (
+        RESULT_PAGE_MAX_CHARS - HEADER_RESERVE - 2 * query_chars - footer_chars,
+        RESULT_PAGE_MAX_BYTES - 2 * HEADER_RESERVE - 2 * query_bytes - footer_bytes
+    )
+
+
+async def render_page_body(db, session, page, per_page, bot_username, files=None):
+    """
+    (file lines, end) of one page, memoized. A page not packed yet takes as many
+    of the next per_page results as fit the message budget and stores where it
+    ends in the session. `files` is that window when the caller already has it;
+    otherwise files are read by _id only on a cache miss.
+    """
+    start, end = session.page_bounds(page)
+    # Keyed by the ids themselves: sessions of one query can order them differently
+    key = (session.version, bot_username)
+    if end is not None:
+        body = page_cache.get(key + (tuple(session.ids[start:end]),))
+        if body is not None:
+            return body, end
+
+    window = session.page_ids(page, per_page)
+    if files is None:
+        files = await db.get_files_by_ids(window)
+    rendered = {file['_id']: render_file_line(file, bot_username) for file in files}
+    lines = [rendered.get(file_id, '') for file_id in window]  # deleted files render as nothing
+
+    if end is None:
+        count = pack_lines([line_cost(line) for line in lines], *page_budget(session), per_page)
+        end = start + count
+        session.set_page_end(page, end)
+
+    body = ''.join(lines[:end - start])
+    page_cache.set(key + (tuple(session.ids[start:end]),), body)
+    return body, end
+
+
+def result_keyboard(token, page, has_next):
+    """Navigation + filter keyboard of a result message, built once per (session, page)"""
+    key = (token, page, has_next)
+    markup = keyboard_cache.get(key)
+    if markup is not None:
+        return markup
+
+    buttons = []
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton("◀️ Previous", callback_data=f"page_{page-1}#{token}"))
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"page_{page+1}#{token}"))
+    if nav_buttons:
+        buttons.append(nav_buttons)
+
+    buttons += [
+        [InlineKeyboardButton("🎭 LANGUAGE", callback_data=f"lang#{token}"),
+         InlineKeyboardButton("🎬 Quality", callback_data=f"qual#{token}")],
+        [InlineKeyboardButton("📺 Season", callback_data=f"season#{token}"),
+         InlineKeyboardButton("📋 Episode", callback_data=f"episode#{token}")],
+        [InlineKeyboardButton("🔞 18+ RARE VIDEOS💦", url=RARE_VIDEOS_LINK)],
+        [InlineKeyboardButton("👑 Get Premium", callback_data="premium"),
+         InlineKeyboardButton("❌ Close", callback_data="close")]
+    ]
+    markup = InlineKeyboardMarkup(buttons)
+    keyboard_cache.set(key, markup)
+    return markup
+
+
+async def render_results(db, session, page, per_page, total, bot_username,
+                         files=None, corrected=False, label=None, missing_label=None):
+    """
+    (HTML text, keyboard, page shown) for one page of a search session - a page
+    past the end shows the last non-empty one, and callers keep that page.
+    label: filter description for the header ("Tamil" -> "Found 12 Tamil files");
+    missing_label: shown instead of the list when a filter leaves nothing.
+    """
+    query = html.escape(session.query)
+
+    if not total and missing_label:
+        text = f"❌ No {html.escape(missing_label)} files found for `{query}`\n\n"
+        end = 0
+    else:
+        # Pages are packed in order; pack any skipped ones to find where this one starts
+        while len(session.boundaries) <= page and session.boundaries[-1] < total:
+            _, end = await render_page_body(db, session, len(session.boundaries) - 1, per_page, bot_username)
+            if end == session.boundaries[-2]:
+                break
+        # A page past the end (stale Next after results shrank) shows the last non-empty one
+        last = len(session.boundaries) - 1
+        while last and session.boundaries[last] >= total:
+            last -= 1
+        page = min(page, last)
+        body, end = await render_page_body(db, session, page, per_page, bot_username, files)
+        start = session.boundaries[page]
+
+        text = f"🔤 Showing results for `{query}`\n" if corrected else ""
+        found = f"{html.escape(label)} files" if label else "files"
+        text += f"📁 Found {format_total(total)} {found} for `{query}`\n"
+        text += f"📄 Showing {start+1}-{end} of {format_total(total)}\n\n"
+        text += body
+
+    text += FOOTER
+    return text, result_keyboard(session.token, page, end < total), page
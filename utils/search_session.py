@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import secrets
+from database.database import current_results_version
+from database.search_index import normalize_query
+from info import SEARCH_SESSION_SIZE, SEARCH_SESSION_TTL, SEARCH_SESSION_MONGO
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class SearchSession:
+    """
+    Server-side state of one result message: the query, its ranked candidate
+    ids, the active filters and the current page. Buttons carry only the token.
+    """
+
+    def __init__(self, token, query, candidates=None, filters=None, ids=None, page=0, version=0,
+                 boundaries=None):
+        self.token = token
+        self.query = query
+        self.version = version  # files-collection version the results belong to
+        self.candidates = candidates  # every result of query, ranked - None until first needed
+        self.filters = filters or {}
+        self.ids = ids if ids is not None else candidates  # candidates narrowed by filters
+        self.page = page
+        self.boundaries = boundaries or [0]  # page N starts at ids[boundaries[N]] - filled as pages are packed
+
+    @property
+    def loaded(self):
+        return self.candidates is not None
+
+    @property
+    def total(self):
+        return len(self.ids) if self.ids is not None else 0
+
+    def page_bounds(self, page):
+        """(start, end) of a packed page, end None if it has not been packed yet"""
+        start = self.boundaries[page]
+        end = self.boundaries[page + 1] if page + 1 < len(self.boundaries) else None
+        return start, end
+
+    def set_page_end(self, page, end):
+        if len(self.boundaries) == page + 1:
+            self.boundaries.append(end)
+
+    def page_ids(self, page, per_page=10):
+        """Ids of page N once packed, else the per_page candidates it will be packed from"""
+        start, end = self.page_bounds(page)
+        return self.ids[start:end if end is not None else start + per_page]
+
+    def to_doc(self):
+        return {
+            'query': self.query,
+            'candidates': self.candidates,
+            'filters': self.filters,
+            'ids': self.ids if self.filters else None,
+            'page': self.page,
+            'version': self.version,
+            'boundaries': self.boundaries
+        }
+
+    @classmethod
+    def from_doc(cls, doc):
+        filters = doc.get('filters') or {}
+        return cls(
+            doc['_id'], doc['query'], doc.get('candidates'), filters,
+            doc.get('ids') if filters else None, doc.get('page', 0), doc.get('version', -1),
+            doc.get('boundaries')
+        )
+
+
+# token -> SearchSession
+search_sessions = TTLCache(maxsize=SEARCH_SESSION_SIZE, ttl=SEARCH_SESSION_TTL)
+
+
+def new_token():
+    """8 url-safe characters - keeps `setepisode_All#<token>` far below Telegram's 64-byte limit"""
+    return secrets.token_urlsafe(6)
+
+
+def _persist(db, session, fields=None):
+    """Write the session (or some of its fields) to Mongo in the background"""
+    if SEARCH_SESSION_MONGO:
+        asyncio.create_task(db.save_search_session(session.token, fields or session.to_doc()))
+
+
+async def open_session(db, query):
+    """
+    Search query and open a session for its result message, or None when nothing
+    matches. The ranked ids are taken once, here, and every page - the first
+    one included - is cut from them, so later downloads or an index becoming
+    ready cannot reorder results between pages.
+    """
+    version = current_results_version()
+    candidates = await db.search_file_ids(query)
+    if not candidates:
+        return None
+    session = SearchSession(new_token(), query, candidates=candidates, version=version)
+    search_sessions.set(session.token, session)
+    _persist(db, session)
+    logger.info(f"📸 Session {session.token} for '{query}': {len(candidates)} files")
+    return session
+
+
+async def get_session(db, token):
+    """Session for a token from memory, then Mongo; None once it has expired"""
+    session = search_sessions.get(token)
+    if session is None and SEARCH_SESSION_MONGO:
+        doc = await db.get_search_session(token)
+        if doc:
+            session = SearchSession.from_doc(doc)
+            search_sessions.set(token, session)
+    return session
+
+
+async def callback_session(db, query):
+    """Session named by `<action>#<token>` callback data, telling the user when it has expired"""
+    token = query.data.split("#", 1)[-1]
+    session = await get_session(db, token)
+    if session is None:
+        await query.answer("⌛ This search has expired. Please search again.", show_alert=True)
+    return session
+
+
+async def load_results(db, session):
+    """Fetch the candidate ids of a session saved without them (older Mongo documents)"""
+    if session.loaded:
+        return session
+    session.version = current_results_version()
+    session.candidates = await db.search_file_ids(session.query)
+    if session.filters:
+        session.ids = await db.filter_file_ids(session.candidates, session.filters)
+    else:
+        session.ids = session.candidates
+    _persist(db, session)
+    logger.info(f"📸 Session {session.token} for '{session.query}': {len(session.candidates)} files")
+    return session
+
+
+async def set_filters(db, session, filters):
+    """Narrow the cached candidates to filters - the search itself is never re-run"""
+    await load_results(db, session)
+    if filters != session.filters:
+        session.filters = filters
+        if filters:
+            session.ids = await db.filter_file_ids(session.candidates, filters)
+        else:
+            session.ids = session.candidates
+        session.page = 0
+        session.boundaries = [0]
+        _persist(db, session, {
+            'filters': filters, 'ids': session.ids if filters else None, 'page': 0, 'boundaries': [0]
+        })
+    return session
+
+
+def set_page(db, session, page):
+    session.page = page
+    _persist(db, session, {'page': page, 'boundaries': session.boundaries})
+
+
+async def session_facets(db, session, menu=None):
+    """
+    Facet counts for a filter menu ('language', 'quality', 'season', 'episode'):
+    over the session's results narrowed by every *other* active filter, so each
+    option shows what choosing it would return. menu None counts under all
+    active filters (used to warm the cache).
+    """
+    await load_results(db, session)
+    others = {name: value for name, value in session.filters.items() if name != menu}
+    if others == session.filters:
+        ids = session.ids
+    else:
+        ids = await db.filter_file_ids(session.candidates, others)
+    key = (session.version, normalize_query(session.query), tuple(sorted(others.items())))
+    return await db.get_facet_counts(ids, key)
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight awaitable and its result"""
+
+    def __init__(self):
+        self._inflight = {}  # key -> asyncio.Future
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, func):
+        """Await func() - or the call already running for key"""
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(future)
+
+    def stats(self):
+        """Coalescing counters for /stats"""
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._inflight),
+            'coalesce_rate': round(self.coalesced / self.calls, 3) if self.calls else 0.0
+        }